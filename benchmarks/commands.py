@@ -0,0 +1,358 @@
+"""Load test for the slash command handlers and BetView.lock_in, driven with fake Discord interactions.
+
+Seeds the given number of guilds and members, links a League of Legends account for some members of every guild
+and opens a game with bets for each of them. Then commands are started at --rate per second (open loop, so slow
+commands pile up like they would in production) and every command reports its latency and the number of database
+round trips (statements and commits) it made.
+
+    DATABASE_URL=postgresql://... python benchmarks/commands.py --guilds 50 --members 200 --rate 200 --duration 60
+
+Discord REST calls (responses, followups, fetch_user) are answered locally after --discord-latency-ms. Run it
+against a disposable PostgreSQL database, members and guilds are created with fresh ids on every run. Without
+DATABASE_URL a temporary SQLite file is used, where daily fails since SQLite has no GREATEST().
+
+As a regression gate, --save-baseline writes the results to a JSON file and --baseline fails the run (exit
+status 1) when a command makes more round trips than the baseline, its p95 latency grew by more than
+--tolerance, or a command in the baseline did not run or failed every time.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "the_house"))
+
+COMMANDS = ["wallet", "daily", "leaderboard", "bet", "lock_in"]
+DEFAULT_MIX = "wallet=4,daily=1,leaderboard=2,bet=3,lock_in=2"
+
+
+@dataclass(slots=True)
+class CommandStats:
+    round_trips: int = 0
+
+
+@dataclass
+class Results:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    round_trips: dict[str, list[int]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    max_in_flight: int = 0
+
+
+# Set while a measured command runs. The database executor copies the context into its threads, so statements
+# run on behalf of a command are counted against it.
+current_command: contextvars.ContextVar[CommandStats | None] = contextvars.ContextVar("current_command", default=None)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class FakeUser:
+    def __init__(self, discord_id: int):
+        self.id = discord_id
+        self.name = f"user{discord_id}"
+        self.display_name = self.name
+        self.display_avatar = f"https://cdn.example/avatars/{discord_id}.png"
+        self.mention = f"<@{discord_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+
+
+class FakeResponse:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def _respond(self):
+        if self.done:
+            raise RuntimeError("This interaction has already been responded to")
+        self.done = True
+        await asyncio.sleep(self.latency)
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+
+    async def edit_message(self, **kwargs):
+        await self._respond()
+
+
+class FakeFollowup:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    def __init__(self, user_id: int, guild_id: int, latency: float):
+        self.user = FakeUser(user_id)
+        self.guild = FakeGuild(guild_id)
+        self.guild_id = guild_id
+        self.response = FakeResponse(latency)
+        self.followup = FakeFollowup(latency)
+        self.extras = {}
+        self.command = None
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for pair in mix.split(","):
+        name, _, weight = pair.partition("=")
+        if name not in COMMANDS:
+            raise argparse.ArgumentTypeError(f"Unknown command {name}, expected one of {', '.join(COMMANDS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def run(args):
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}")
+    os.environ.setdefault("METRICS_PORT", "0")
+
+    import logging
+    from sqlalchemy import event
+
+    import utils
+    from config import DATABASE_POOL_SIZE
+    from db_utils import resolve_member, set_lol_account
+    from services import services, engine
+
+    logging.getLogger().setLevel(logging.WARNING)
+    latency = args.discord_latency_ms / 1000
+    services.db_executor = ContextThreadPoolExecutor(max_workers=DATABASE_POOL_SIZE, thread_name_prefix="db")
+
+    def count_round_trip(*_):
+        stats = current_command.get()
+        if stats is not None:
+            stats.round_trips += 1
+
+    event.listen(engine, "before_cursor_execute", count_round_trip)
+    event.listen(engine, "commit", count_round_trip)
+
+    async def fetch_user(discord_id: int):
+        await asyncio.sleep(latency)
+        return FakeUser(discord_id)
+
+    utils.bot.fetch_user = fetch_user
+
+    # Fresh ids on every run, so daily rewards can be claimed again
+    base_id = int(time.time()) * 10 ** 6
+    guilds = {base_id + guild: [base_id + 10 ** 5 + guild * args.members + member for member in range(args.members)]
+              for guild in range(args.guilds)}
+    players = {guild_id: members[:args.players] for guild_id, members in guilds.items()}
+
+    print(f"Seeding {args.guilds} guilds with {args.members} members and {args.players} players each")
+    seed_started = time.perf_counter()
+    semaphore = asyncio.Semaphore(DATABASE_POOL_SIZE * 2)
+
+    async def seed_member(guild_id: int, discord_id: int):
+        async with semaphore:
+            user, guild, bank = await resolve_member(discord_id, guild_id)
+            if discord_id in players[guild_id]:
+                await set_lol_account(user.id, guild.id, "na1", f"load-puuid-{guild_id}-{discord_id}")
+
+    await asyncio.gather(*(seed_member(guild_id, discord_id) for guild_id, members in guilds.items()
+                           for discord_id in members))
+    for guild_id, discord_ids in players.items():
+        for discord_id in discord_ids:
+            game = utils.bet_book.open(f"load-puuid-{guild_id}-{discord_id}", time.time())
+            game.win_odds, game.lose_odds = 1.8, 2.2
+    print(f"Seeded in {time.perf_counter() - seed_started:.1f}s")
+
+    def pick_member() -> tuple[int, int, int]:
+        guild_id = random.choice(list(guilds))
+        return guild_id, random.choice(guilds[guild_id]), random.choice(players[guild_id])
+
+    async def open_bet_view(interaction: FakeInteraction, target_id: int):
+        can_create_ui, message, view = await utils.can_create_bet_view(interaction, FakeUser(target_id))
+        if not can_create_ui:
+            raise RuntimeError(message)
+        return view
+
+    async def run_command(name: str, results: Results):
+        guild_id, user_id, target_id = pick_member()
+        interaction = FakeInteraction(user_id, guild_id, latency)
+        if name == "lock_in":
+            # Opening the view is the bet command, only the button press itself is measured
+            view = await open_bet_view(interaction, target_id)
+            view.amount = min(view.bank.coins, random.choice([1, 5, 10, 25]))
+            view.outcome_win = random.random() < 0.5
+            interaction = FakeInteraction(user_id, guild_id, latency)
+
+        stats = CommandStats()
+        token = current_command.set(stats)
+        started = time.perf_counter()
+        try:
+            if name == "lock_in":
+                await view.lock_in.callback(interaction)
+            elif name == "bet":
+                await utils.bet.callback(interaction, FakeUser(target_id))
+            else:
+                await getattr(utils, name).callback(interaction)
+        finally:
+            current_command.reset(token)
+        results.latencies[name].append(time.perf_counter() - started)
+        results.round_trips[name].append(stats.round_trips)
+
+    async def keep_bets_open():
+        # Games would otherwise leave the betting window during long runs
+        while True:
+            await asyncio.sleep(30)
+            for game in utils.bet_book.games.values():
+                game.start_time = time.time()
+
+    results = Results()
+    in_flight = set()
+
+    def finished(task: asyncio.Task, name: str):
+        in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            results.errors[name] += 1
+            if results.errors[name] == 1:
+                print(f"  {name} failed: {task.exception()!r}")
+
+    names, weights = zip(*args.mix.items())
+    print(f"Running {args.rate:.0f} commands/s for {args.duration:.0f}s, mix {args.mix}")
+    refresher = asyncio.create_task(keep_bets_open())
+    started_at = time.perf_counter()
+    sent = 0
+    while (elapsed := time.perf_counter() - started_at) < args.duration:
+        while sent < elapsed * args.rate:
+            name = random.choices(names, weights)[0]
+            task = asyncio.create_task(run_command(name, results))
+            task.add_done_callback(lambda done, name=name: finished(done, name))
+            in_flight.add(task)
+            sent += 1
+        results.max_in_flight = max(results.max_in_flight, len(in_flight))
+        await asyncio.sleep(0.005)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    total_time = time.perf_counter() - started_at
+    refresher.cancel()
+    services.db_executor.shutdown()
+
+    return report(args, results, total_time)
+
+
+def report(args, results: Results, total_time: float) -> dict:
+    summary = {}
+    completed = sum(len(latencies) for latencies in results.latencies.values())
+    print()
+    print(f"Completed {completed} commands in {total_time:.1f}s ({completed / total_time:.1f}/s), "
+          f"at most {results.max_in_flight} in flight")
+    print(f"{'command':<12} {'count':>7} {'errors':>7} {'per s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'trips':>6}")
+    for name in COMMANDS:
+        latencies = results.latencies.get(name, [])
+        errors = results.errors.get(name, 0)
+        if not latencies and not errors:
+            continue
+        # Commands that failed every time still get a row, with no latencies, so the baseline check sees them
+        summary[name] = {
+            'count': len(latencies),
+            'errors': errors,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+            'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+            'max_ms': max(latencies) * 1000 if latencies else None,
+            'round_trips': statistics.mean(results.round_trips[name]) if latencies else None,
+        }
+        row = summary[name]
+        print(f"{name:<12} {row['count']:>7} {row['errors']:>7} {row['count'] / total_time:>7.1f} "
+              f"{format_stat(row['p50_ms'], 8, '.1f')} {format_stat(row['p95_ms'], 8, '.1f')} "
+              f"{format_stat(row['p99_ms'], 8, '.1f')} {format_stat(row['max_ms'], 8, '.1f')} "
+              f"{format_stat(row['round_trips'], 6, '.2f')}")
+    return summary
+
+
+def format_stat(value: float | None, width: int, spec: str) -> str:
+    return f"{'-' if value is None else format(value, spec):>{width}}"
+
+
+def check_baseline(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, expected in baseline.items():
+        actual = summary.get(name)
+        if actual is None:
+            regressions.append(f"{name}: did not run, baseline has {expected['count']} completed")
+            continue
+        if not actual['count']:
+            regressions.append(f"{name}: all {actual['errors']} calls failed")
+            continue
+        if expected['round_trips'] is None:
+            continue
+        if actual['round_trips'] > expected['round_trips'] + 0.05:
+            regressions.append(f"{name}: {actual['round_trips']:.2f} round trips, baseline "
+                               f"{expected['round_trips']:.2f}")
+        if actual['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {actual['p95_ms']:.1f}ms, baseline {expected['p95_ms']:.1f}ms")
+        if actual['errors'] > expected['errors']:
+            regressions.append(f"{name}: {actual['errors']} errors, baseline {expected['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=100, help="Members per guild")
+    parser.add_argument("--players", type=int, default=5, help="Members per guild with a game open for bets")
+    parser.add_argument("--rate", type=float, default=50, help="Commands started per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to keep starting commands for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Relative command weights (default {DEFAULT_MIX})")
+    parser.add_argument("--discord-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 latency growth over the baseline")
+    args = parser.parse_args()
+    args.players = min(args.players, args.members - 1)
+
+    random.seed(args.seed)
+    summary = asyncio.run(run(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(summary, file, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = check_baseline(summary, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Seeds a synthetic dataset and reports timings and query plans for the db_utils read paths.
+
+Run against a throwaway database only, it inserts a lot of rows:
+
+    DATABASE_URL=postgresql://... python benchmarks/db_queries.py --yes-seed-this-database
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "the_house"))
+
+from sqlalchemy import event, insert, text  # noqa: E402
+
+import db_utils  # noqa: E402
+from models import User, Guild, Bank, LeagueOfLegendsAccount, LeagueOfLegendsMatchResult  # noqa: E402
+from services import engine, SessionLocal  # noqa: E402
+
+REGIONS = ["na1", "euw1", "eun1", "kr", "br1", "oc1"]
+QUEUE_IDS = [400, 420, 440, 450]
+BATCH_SIZE = 5000
+
+
+def insert_batches(connection, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed(users: int, guilds: int, accounts_per_guild: int, results_per_account: int) -> dict:
+    random.seed(0)
+    with engine.begin() as connection:
+        user_offset = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM users")).scalar()
+        guild_offset = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM guilds")).scalar()
+
+        insert_batches(connection, User, [
+            {'id': user_offset + i, 'discord_account_id': 10 ** 15 + user_offset + i} for i in range(1, users + 1)
+        ])
+        insert_batches(connection, Guild, [
+            {'id': guild_offset + i, 'guild_id': 10 ** 15 + guild_offset + i} for i in range(1, guilds + 1)
+        ])
+
+        banks = []
+        accounts = []
+        results = []
+        for guild in range(guild_offset + 1, guild_offset + guilds + 1):
+            members = random.sample(range(user_offset + 1, user_offset + users + 1), min(users, accounts_per_guild))
+            for user in members:
+                puuid = f"bench-puuid-{user}"
+                banks.append({'user_id': user, 'guild_id': guild, 'coins': random.uniform(0, 10000)})
+                accounts.append({'user_id': user, 'guild_id': guild, 'region': REGIONS[user % len(REGIONS)],
+                                 'puuid': puuid})
+
+        for user in range(user_offset + 1, user_offset + users + 1):
+            for match in range(results_per_account):
+                results.append({'puuid': f"bench-puuid-{user}", 'match_id': f"BENCH_{user}_{match}",
+                                'queue_id': random.choice(QUEUE_IDS), 'win': random.random() < 0.5,
+                                'game_end_timestamp': 1_700_000_000_000 + match * 1_800_000})
+
+        insert_batches(connection, Bank, banks)
+        insert_batches(connection, LeagueOfLegendsAccount, accounts)
+        insert_batches(connection, LeagueOfLegendsMatchResult, results)
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+
+    return {
+        'discord_account_id': 10 ** 15 + user_offset + 1,
+        'user_id': user_offset + 1,
+        'puuid': f"bench-puuid-{user_offset + 1}",
+        'guild_snowflake': 10 ** 15 + guild_offset + 1,
+        'guild_id': guild_offset + 1,
+    }
+
+
+def queries(sample: dict) -> dict:
+    return {
+        'resolve_member': lambda: db_utils.resolve_member(sample['discord_account_id'], sample['guild_snowflake']),
+        'get_lol_account': lambda: db_utils.get_lol_account(sample['user_id'], sample['guild_id']),
+        'get_lol_accounts_by_puuid': lambda: db_utils.get_lol_accounts_by_puuid(sample['puuid']),
+        'get_lol_accounts_by_guild_id': lambda: db_utils.get_lol_accounts_by_guild_id(sample['guild_id']),
+        'get_banks_sorted_by_coins_for_guild': lambda: db_utils.get_banks_sorted_by_coins_for_guild(
+            sample['guild_id'], 10),
+        'get_recent_match_results': lambda: db_utils.get_recent_match_results(sample['puuid'], 420, 20),
+        'get_match_details_by_match_id': lambda: db_utils.get_match_details_by_match_id("BENCH_missing"),
+    }
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+
+def explain(statement: str, parameters, analyze: bool) -> list[str]:
+    if engine.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    elif engine.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return [f"EXPLAIN is not supported for {engine.dialect.name}"]
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+async def run(args):
+    print(f"Seeding {args.users} users, {args.guilds} guilds with {args.accounts_per_guild} accounts each and "
+          f"{args.results_per_account} match results per account...")
+    start = time.perf_counter()
+    sample = seed(args.users, args.guilds, args.accounts_per_guild, args.results_per_account)
+    print(f"Seeded in {time.perf_counter() - start:.1f}s\n")
+
+    for name, query in queries(sample).items():
+        if args.only and name not in args.only:
+            continue
+
+        recorder = StatementRecorder()
+        event.listen(engine, "before_cursor_execute", recorder)
+        try:
+            await query()
+        finally:
+            event.remove(engine, "before_cursor_execute", recorder)
+
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            await query()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name}: median {statistics.median(timings):.2f}ms, p95 {p95:.2f}ms, max {timings[-1]:.2f}ms")
+
+        if args.explain:
+            for statement, parameters in recorder.statements:
+                if not statement.lstrip().upper().startswith("SELECT"):
+                    continue
+                for line in explain(statement, parameters, args.analyze):
+                    print(f"    {line}")
+            print()
+
+    SessionLocal.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--accounts-per-guild", type=int, default=200)
+    parser.add_argument("--results-per-account", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", nargs="*", help="Only benchmark these db_utils functions")
+    parser.add_argument("--no-explain", dest="explain", action="store_false", help="Skip printing query plans")
+    parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE on PostgreSQL")
+    parser.add_argument("--yes-seed-this-database", action="store_true", help="Confirm DATABASE_URL is disposable")
+    args = parser.parse_args()
+
+    if not args.yes_seed_this_database:
+        parser.error(f"refusing to seed {engine.url!r} without --yes-seed-this-database")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
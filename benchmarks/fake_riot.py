@@ -0,0 +1,376 @@
+"""Local stand-in for the Riot API that serves scripted player timelines.
+
+Players are grouped into parties that alternate between idle time and games. Account, summoner, match-v5 and
+spectator-v5 endpoints answer from that timeline, with Riot style rate limit headers, 429s, random latency and
+optional injected errors. Finished matches only show up in match-v5 after a result delay, like the real API.
+
+Run on its own and point the bot at it with RIOT_API_BASE_URL:
+
+    python benchmarks/fake_riot.py --players 500 --port 8081
+    RIOT_API_BASE_URL='http://127.0.0.1:8081/{routing}' python the_house/main.py
+"""
+import argparse
+import asyncio
+import bisect
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+PLATFORM = "na1"
+QUEUE_IDS = [420, 440, 400, 450]
+FIRST_GAME_ID = 5_000_000_000
+# Most players queue alone, the rest in duos, trios or five-stacks
+PARTY_SIZES = [1, 1, 1, 2, 2, 3, 5]
+
+# Method limits in the same "count:seconds" format Riot sends in X-Method-Rate-Limit
+METHOD_RATE_LIMITS = {
+    "account-v1.by-riot-id": "1000:60",
+    "account-v1.by-puuid": "1000:60",
+    "summoner-v4.by-puuid": "1600:60",
+    "match-v5.ids-by-puuid": "2000:10",
+    "match-v5.match": "2000:10",
+    "spectator-v5.by-summoner": "20000:10",
+}
+
+
+def parse_limits(header: str) -> list[tuple[int, int]]:
+    return [(int(count), int(seconds)) for count, seconds in
+            (pair.split(":") for pair in header.split(",") if pair)]
+
+
+@dataclass(slots=True)
+class ScriptedGame:
+    game_id: int
+    start: float
+    end: float
+    queue_id: int
+    puuids: list[str]
+    participants: list[dict]
+    remake: bool
+
+    @property
+    def match_id(self) -> str:
+        return f"{PLATFORM.upper()}_{self.game_id}"
+
+
+@dataclass(slots=True)
+class Player:
+    puuid: str
+    game_name: str
+    tag_line: str
+    games: list[ScriptedGame] = field(default_factory=list)
+    starts: list[float] = field(default_factory=list)
+
+
+# Pre-computes every game of every player for the whole run, so any endpoint can be answered for any moment.
+class Timeline:
+    def __init__(self, players: int, duration: float, start_time: float = None, max_party_size: int = 5,
+                 idle_mean: float = 900, game_min: float = 1200, game_max: float = 2400, history: int = 20,
+                 remake_rate: float = 0.02, seed: int = 0):
+        self.random = random.Random(seed)
+        self.start_time = time.time() if start_time is None else start_time
+        self.players = {
+            f"bench-puuid-{i}": Player(f"bench-puuid-{i}", f"Player{i}", "BENCH") for i in range(players)
+        }
+        self.games: dict[str, ScriptedGame] = {}
+        self.next_game_id = FIRST_GAME_ID
+
+        puuids = list(self.players)
+        self.random.shuffle(puuids)
+        while puuids:
+            size = min(len(puuids), max_party_size, self.random.choice(PARTY_SIZES))
+            party, puuids = puuids[:size], puuids[size:]
+            self._script_party(party, duration, idle_mean, game_min, game_max, history, remake_rate)
+
+        for player in self.players.values():
+            player.games.sort(key=lambda game: game.start)
+            player.starts = [game.start for game in player.games]
+
+    def _add_game(self, party: list[str], start: float, end: float, remake_rate: float):
+        game_id = self.next_game_id
+        self.next_game_id += 1
+
+        fillers = [f"filler-{game_id}-{i}" for i in range(10 - len(party))]
+        party_wins = self.random.random() < 0.5
+        remake = self.random.random() < remake_rate
+        participants = [
+            {
+                'puuid': puuid,
+                'championId': self.random.randint(1, 150),
+                'teamId': 100 if index < 5 else 200,
+                'win': party_wins == (index < 5),
+                'gameEndedInEarlySurrender': remake,
+            }
+            for index, puuid in enumerate(party + fillers)
+        ]
+        game = ScriptedGame(game_id, start, end, self.random.choice(QUEUE_IDS), party, participants, remake)
+        self.games[game.match_id] = game
+        for puuid in party:
+            self.players[puuid].games.append(game)
+
+    def _script_party(self, party: list[str], duration: float, idle_mean: float, game_min: float,
+                      game_max: float, history: int, remake_rate: float):
+        # Finished games from before the run, used by the odds calculation
+        end = self.start_time - self.random.uniform(0, idle_mean)
+        for _ in range(history):
+            start = end - self.random.uniform(game_min, game_max)
+            self._add_game(party, start, end, remake_rate)
+            end = start - self.random.expovariate(1 / idle_mean)
+
+        start = self.start_time + self.random.uniform(0, idle_mean)
+        while start < self.start_time + duration:
+            end = start + self.random.uniform(game_min, game_max)
+            self._add_game(party, start, end, remake_rate)
+            start = end + self.random.expovariate(1 / idle_mean)
+
+    def live_game(self, puuid: str, now: float) -> ScriptedGame | None:
+        player = self.players.get(puuid)
+        if player is None:
+            return None
+        index = bisect.bisect_right(player.starts, now) - 1
+        if index >= 0 and player.games[index].end > now:
+            return player.games[index]
+        return None
+
+    def finished_games(self, puuid: str, visible_before: float) -> list[ScriptedGame]:
+        player = self.players.get(puuid)
+        if player is None:
+            return []
+        return [game for game in reversed(player.games) if game.end <= visible_before]
+
+
+class FixedWindowLimit:
+    def __init__(self, count: int, seconds: int):
+        self.count = count
+        self.seconds = seconds
+        self.window_start = 0.0
+        self.used = 0
+
+    def roll(self, now: float):
+        if now - self.window_start >= self.seconds:
+            self.window_start = now
+            self.used = 0
+
+
+# Riot counts requests in fixed windows that start with the first request after the previous window expired
+class RateLimitGroup:
+    def __init__(self, header: str):
+        self.header = header
+        self.limits = [FixedWindowLimit(count, seconds) for count, seconds in parse_limits(header)]
+
+    def retry_after(self, now: float) -> float | None:
+        for limit in self.limits:
+            limit.roll(now)
+        exceeded = [limit for limit in self.limits if limit.used >= limit.count]
+        if exceeded:
+            return max(limit.window_start + limit.seconds - now for limit in exceeded)
+        return None
+
+    def consume(self):
+        for limit in self.limits:
+            limit.used += 1
+
+    def count_header(self) -> str:
+        return ",".join(f"{limit.used}:{limit.seconds}" for limit in self.limits)
+
+
+class FakeRiotServer:
+    def __init__(self, timeline: Timeline, app_rate_limit: str = "500:10,30000:600", latency_ms: float = 60,
+                 latency_jitter_ms: float = 30, result_delay: float = 60, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, seed: int = 0):
+        self.timeline = timeline
+        self.app_rate_limit = app_rate_limit
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.result_delay = result_delay
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.app_groups: dict[str, RateLimitGroup] = {}
+        self.method_groups: dict[tuple[str, str], RateLimitGroup] = {}
+        self.requests: Counter[tuple[str, int]] = Counter()
+        self.runner: web.AppRunner | None = None
+
+    def _rate_limit_headers(self, app_group: RateLimitGroup, method_group: RateLimitGroup) -> dict:
+        return {
+            "X-App-Rate-Limit": app_group.header,
+            "X-App-Rate-Limit-Count": app_group.count_header(),
+            "X-Method-Rate-Limit": method_group.header,
+            "X-Method-Rate-Limit-Count": method_group.count_header(),
+        }
+
+    def endpoint(self, method: str, handler):
+        async def handle(request: web.Request) -> web.Response:
+            routing = request.match_info['routing']
+            app_group = self.app_groups.setdefault(routing, RateLimitGroup(self.app_rate_limit))
+            method_group = self.method_groups.setdefault((routing, method), RateLimitGroup(METHOD_RATE_LIMITS[method]))
+
+            latency = max(0.0, self.random.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000
+            await asyncio.sleep(latency)
+
+            now = time.time()
+            app_retry_after = app_group.retry_after(now)
+            method_retry_after = method_group.retry_after(now)
+            if app_retry_after is not None or method_retry_after is not None:
+                limit_type = "application" if app_retry_after is not None else "method"
+                retry_after = max(app_retry_after or 0, method_retry_after or 0)
+                response = web.json_response(
+                    {'status': {'message': "Rate limit exceeded", 'status_code': 429}}, status=429,
+                    headers={**self._rate_limit_headers(app_group, method_group),
+                             "Retry-After": str(math.ceil(retry_after)), "X-Rate-Limit-Type": limit_type}
+                )
+            elif self.random.random() < self.throttle_rate:
+                # Riot's shared service limits can reject a request even when the application has budget left
+                response = web.json_response({'status': {'message': "Rate limit exceeded", 'status_code': 429}},
+                                             status=429, headers={"Retry-After": "1"})
+            elif self.random.random() < self.error_rate:
+                response = web.json_response({'status': {'message': "Service unavailable", 'status_code': 503}},
+                                             status=503)
+            else:
+                app_group.consume()
+                method_group.consume()
+                response = handler(request, now)
+                response.headers.update(self._rate_limit_headers(app_group, method_group))
+
+            self.requests[(method, response.status)] += 1
+            return response
+
+        return handle
+
+    def _not_found(self) -> web.Response:
+        return web.json_response({'status': {'message': "Data not found", 'status_code': 404}}, status=404)
+
+    def _account(self, player) -> web.Response:
+        return web.json_response({'puuid': player.puuid, 'gameName': player.game_name, 'tagLine': player.tag_line})
+
+    def account_by_riot_id(self, request: web.Request, now: float) -> web.Response:
+        game_name, tag_line = request.match_info['game_name'], request.match_info['tag_line']
+        for player in self.timeline.players.values():
+            if player.game_name == game_name and player.tag_line == tag_line:
+                return self._account(player)
+        return self._not_found()
+
+    def account_by_puuid(self, request: web.Request, now: float) -> web.Response:
+        player = self.timeline.players.get(request.match_info['puuid'])
+        return self._account(player) if player else self._not_found()
+
+    def summoner_by_puuid(self, request: web.Request, now: float) -> web.Response:
+        player = self.timeline.players.get(request.match_info['puuid'])
+        if player is None:
+            return self._not_found()
+        return web.json_response({'puuid': player.puuid, 'summonerLevel': 100, 'profileIconId': 1})
+
+    def match_ids_by_puuid(self, request: web.Request, now: float) -> web.Response:
+        query = request.query
+        games = self.timeline.finished_games(request.match_info['puuid'], now - self.result_delay)
+        if 'queue' in query:
+            games = [game for game in games if game.queue_id == int(query['queue'])]
+        if 'startTime' in query:
+            games = [game for game in games if game.start >= int(query['startTime'])]
+        start = int(query.get('start', 0))
+        count = int(query.get('count', 20))
+        return web.json_response([game.match_id for game in games[start:start + count]])
+
+    def match(self, request: web.Request, now: float) -> web.Response:
+        game = self.timeline.games.get(request.match_info['match_id'])
+        if game is None or game.end > now - self.result_delay:
+            return self._not_found()
+        return web.json_response({
+            'metadata': {'matchId': game.match_id, 'participants': [p['puuid'] for p in game.participants]},
+            'info': {
+                'gameId': game.game_id,
+                'queueId': game.queue_id,
+                'gameStartTimestamp': int(game.start * 1000),
+                'gameEndTimestamp': int(game.end * 1000),
+                'participants': game.participants,
+            },
+        })
+
+    def active_game(self, request: web.Request, now: float) -> web.Response:
+        game = self.timeline.live_game(request.match_info['puuid'], now)
+        if game is None:
+            return self._not_found()
+        return web.json_response({
+            'gameId': game.game_id,
+            'platformId': PLATFORM.upper(),
+            'gameQueueConfigId': game.queue_id,
+            'gameStartTime': int(game.start * 1000),
+            'gameLength': int(now - game.start),
+            'participants': [
+                {'puuid': p['puuid'], 'championId': p['championId'], 'teamId': p['teamId']}
+                for p in game.participants
+            ],
+        })
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        prefix = "/{routing}"
+        app.router.add_get(f"{prefix}/riot/account/v1/accounts/by-riot-id/{{game_name}}/{{tag_line}}",
+                           self.endpoint("account-v1.by-riot-id", self.account_by_riot_id))
+        app.router.add_get(f"{prefix}/riot/account/v1/accounts/by-puuid/{{puuid}}",
+                           self.endpoint("account-v1.by-puuid", self.account_by_puuid))
+        app.router.add_get(f"{prefix}/lol/summoner/v4/summoners/by-puuid/{{puuid}}",
+                           self.endpoint("summoner-v4.by-puuid", self.summoner_by_puuid))
+        app.router.add_get(f"{prefix}/lol/match/v5/matches/by-puuid/{{puuid}}/ids",
+                           self.endpoint("match-v5.ids-by-puuid", self.match_ids_by_puuid))
+        app.router.add_get(f"{prefix}/lol/match/v5/matches/{{match_id}}",
+                           self.endpoint("match-v5.match", self.match))
+        app.router.add_get(f"{prefix}/lol/spectator/v5/active-games/by-summoner/{{puuid}}",
+                           self.endpoint("spectator-v5.by-summoner", self.active_game))
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        return f"http://{host}:{port}/{{routing}}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+def add_timeline_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--idle-mean", type=float, default=900, help="Mean seconds between games")
+    parser.add_argument("--game-min", type=float, default=1200, help="Shortest game in seconds")
+    parser.add_argument("--game-max", type=float, default=2400, help="Longest game in seconds")
+    parser.add_argument("--result-delay", type=float, default=60,
+                        help="Seconds after a game ends before match-v5 returns it")
+    parser.add_argument("--app-rate-limit", default="500:10,30000:600")
+    parser.add_argument("--latency-ms", type=float, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a service 429")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+async def serve(args):
+    timeline = Timeline(args.players, args.duration, idle_mean=args.idle_mean, game_min=args.game_min,
+                        game_max=args.game_max, seed=args.seed)
+    server = FakeRiotServer(timeline, args.app_rate_limit, args.latency_ms, result_delay=args.result_delay,
+                            error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+    base_url = await server.start(args.host, args.port)
+    print(f"Serving {len(timeline.players)} players and {len(timeline.games)} games at {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_timeline_arguments(parser)
+    parser.add_argument("--duration", type=float, default=24 * 3600, help="Seconds of timeline to script")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
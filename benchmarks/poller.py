@@ -0,0 +1,225 @@
+"""End-to-end benchmark of the League of Legends poller against the fake Riot API in fake_riot.py.
+
+Starts the fake server in-process, points lol_api_utils at it and runs the real polling engine, state machine,
+odds calculation and match cache for the given number of accounts. Discord messages and bank updates are
+stubbed out, every announced game gets one bet so its result is awaited and settled.
+
+Timelines and poll intervals are divided by --time-scale, so a 10x run covers 10 minutes of play in one
+minute. Latencies are reported in real seconds and, in brackets, scaled back to production time.
+
+    python benchmarks/poller.py --players 500 --duration 300 --time-scale 10
+
+DATABASE_URL defaults to a temporary SQLite file, point it at a disposable PostgreSQL database for runs
+with thousands of accounts. Set TRACE_FILE to also write the spans of the run.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from fake_riot import FakeRiotServer, Timeline, PLATFORM, add_timeline_arguments
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "the_house"))
+
+SCALED_POLLER_SETTINGS = [
+    "POLL_INTERVAL_JUST_STARTED",
+    "POLL_INTERVAL_IN_GAME",
+    "POLL_INTERVAL_RECENTLY_ACTIVE",
+    "POLL_INTERVAL_IDLE",
+    "POLL_INTERVAL_LONG_IDLE",
+    "POLL_INTERVAL_NEVER_SEEN",
+    "POLL_INTERVAL_AWAITING_RESULT",
+    "RECENTLY_ACTIVE_SECONDS",
+    "LONG_IDLE_SECONDS",
+    "BET_WINDOW_MINUTES",
+]
+SCALED_UTILS_SETTINGS = ["MATCH_RESULT_TIMEOUT", "LIVE_GAME_MAX_AGE"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(values: list[float], scale: float) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p50 = statistics.median(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (f"p50 {p50:.2f}s [{p50 * scale:.0f}s], p95 {p95:.2f}s [{p95 * scale:.0f}s], "
+            f"max {values[-1]:.2f}s [{values[-1] * scale:.0f}s]")
+
+
+class Recorder:
+    def __init__(self):
+        self.polls: dict[str, list[float]] = defaultdict(list)
+        self.starts: dict[int, float] = {}
+        self.ends: dict[int, float] = {}
+        self.settled: dict[int, float] = {}
+        self.odds_ready: list[float] = []
+
+
+async def run(args):
+    scale = args.time_scale
+    port = free_port()
+    os.environ["RIOT_API_BASE_URL"] = f"http://127.0.0.1:{port}/{{routing}}"
+    os.environ.setdefault("RIOT_API_KEY", "benchmark")
+    os.environ["RIOT_APP_RATE_LIMIT"] = args.app_rate_limit
+    os.environ["POLL_WORKERS_PER_REGION"] = str(args.workers)
+    # Every routing value is served by the one fake host, so the per-host connection limit must not cap it
+    os.environ.setdefault("HTTP_CONNECTION_LIMIT_PER_HOST", "0")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}")
+
+    timeline = Timeline(args.players, args.duration, idle_mean=args.idle_mean / scale,
+                        game_min=args.game_min / scale, game_max=args.game_max / scale, seed=args.seed)
+    server = FakeRiotServer(timeline, args.app_rate_limit, args.latency_ms, result_delay=args.result_delay / scale,
+                            error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+    await server.start(port=port)
+
+    import poller
+    import utils
+    from bet_book import BetGame, Wager
+    from models import LeagueOfLegendsAccount, User, Guild
+    from poller import PollingEngine, IN_GAME, AWAITING_RESULT, IDLE
+    from services import services
+    from tracing import exporter as span_exporter
+
+    for name in SCALED_POLLER_SETTINGS:
+        setattr(poller, name, getattr(poller, name) / scale)
+    for name in SCALED_UTILS_SETTINGS:
+        setattr(utils, name, getattr(utils, name) / scale)
+
+    recorder = Recorder()
+
+    async def no_messages(*args, **kwargs):
+        return []
+
+    async def no_bank_updates(*args, **kwargs):
+        pass
+
+    utils.send_match_start_discord_messages = no_messages
+    utils.send_match_end_discord_messages = no_messages
+    utils.update_match_start_odds = no_messages
+    utils.payout_winners = no_bank_updates
+    utils.refund_bets = no_bank_updates
+
+    start_game = utils.start_league_of_legends_game
+    fill_in_odds = utils.fill_in_odds
+
+    async def start_game_with_bet(puuid: str, region: str, live_match_details: dict):
+        await start_game(puuid, region, live_match_details)
+        recorder.starts.setdefault(live_match_details['gameId'], time.time())
+        utils.bet_book.place(utils.bet_book.get(puuid), Wager(0, 0, True, 1))
+
+    async def timed_fill_in_odds(puuid: str, region: str, queue_id: int | None, player_bets: BetGame):
+        await fill_in_odds(puuid, region, queue_id, player_bets)
+        recorder.odds_ready.append(time.time() - player_bets.start_time)
+
+    utils.start_league_of_legends_game = start_game_with_bet
+    utils.fill_in_odds = timed_fill_in_odds
+
+    async def process_account(puuid: str, region: str):
+        recorder.polls[puuid].append(time.time())
+        before = utils.cached_league_of_legends_games.get(puuid) or {}
+        try:
+            await utils.process_league_of_legends_account(puuid, region)
+        finally:
+            after = utils.cached_league_of_legends_games.get(puuid) or {}
+            if before.get('state') == IN_GAME and after.get('state') == AWAITING_RESULT:
+                recorder.ends.setdefault(before['game_id'], time.time())
+            elif before.get('state') == AWAITING_RESULT and after.get('state') == IDLE:
+                recorder.settled.setdefault(before['game_id'], time.time())
+
+    await services.http.start()
+    utils.polling_engine = PollingEngine(process_account, utils.get_poll_interval, args.workers)
+    utils.account_registry.replace_all([
+        LeagueOfLegendsAccount(id=index, user_id=index, guild_id=1, region=PLATFORM, puuid=puuid,
+                               game_name=player.game_name, tag_line=player.tag_line,
+                               user=User(id=index, discord_account_id=index), guild=Guild(id=1, guild_id=1))
+        for index, (puuid, player) in enumerate(timeline.players.items(), start=1)
+    ])
+
+    print(f"Polling {len(timeline.players)} accounts for {args.duration:.0f}s at {scale}x time scale "
+          f"({len(timeline.games)} scripted games)")
+    started_at = time.time()
+    utils.polling_engine.sync_accounts(utils.account_registry.puuids_by_region())
+    try:
+        while time.time() - started_at < args.duration:
+            await asyncio.sleep(min(10.0, args.duration - (time.time() - started_at)))
+            print(f"  {time.time() - started_at:.0f}s: {sum(server.requests.values())} requests, "
+                  f"{len(recorder.starts)} starts, {len(recorder.ends)} ends, {len(recorder.settled)} settled")
+    finally:
+        await utils.polling_engine.stop()
+        for task in list(utils.odds_tasks):
+            task.cancel()
+        await asyncio.gather(*utils.odds_tasks, return_exceptions=True)
+        await services.http.close()
+        await server.stop()
+        if span_exporter:
+            span_exporter.flush_now()
+    finished_at = time.time()
+
+    report(args, timeline, server, recorder, started_at, finished_at)
+
+
+def report(args, timeline: Timeline, server: FakeRiotServer, recorder: Recorder, started_at: float,
+           finished_at: float):
+    scale = args.time_scale
+    games = {game.game_id: game for game in timeline.games.values()}
+
+    poll_gaps = [later - earlier for polls in recorder.polls.values() for earlier, later in zip(polls, polls[1:])]
+    total_polls = sum(len(polls) for polls in recorder.polls.values())
+
+    # Games that started while the run was already polling, earlier ones are never announced
+    expected_starts = [game for game in games.values() if started_at < game.start < finished_at]
+    expected_ends = [game for game in games.values() if game.game_id in recorder.starts and game.end < finished_at]
+    start_latency = [recorder.starts[game_id] - games[game_id].start for game_id in recorder.starts]
+    end_latency = [recorder.ends[game_id] - games[game_id].end for game_id in recorder.ends]
+    settle_latency = [recorder.settled[game_id] - games[game_id].end for game_id in recorder.settled]
+
+    requests_by_method = Counter()
+    statuses = Counter()
+    for (method, status), count in server.requests.items():
+        requests_by_method[method] += count
+        statuses[status] += count
+    total_requests = sum(requests_by_method.values())
+    events = len(recorder.starts) + len(recorder.ends)
+
+    print()
+    print(f"Accounts:              {len(timeline.players)}, {args.workers} workers, {scale}x time scale")
+    print(f"Polls:                 {total_polls} ({total_polls / (finished_at - started_at):.1f}/s)")
+    print(f"Time between polls:    {percentiles(poll_gaps, scale)}")
+    print(f"Riot requests:         {total_requests} ({total_requests / (finished_at - started_at):.1f}/s), "
+          f"statuses {dict(sorted(statuses.items()))}")
+    for method, count in requests_by_method.most_common():
+        print(f"  {method:<24} {count}")
+    print(f"Requests per event:    {total_requests / events:.1f}" if events else "Requests per event:    n/a")
+    print(f"Game starts detected:  {len(recorder.starts)} of {len(expected_starts)}")
+    print(f"  detection latency    {percentiles(start_latency, scale)}")
+    print(f"  odds ready after     {percentiles(recorder.odds_ready, scale)}")
+    print(f"Game ends detected:    {len(recorder.ends)} of {len(expected_ends)}")
+    print(f"  detection latency    {percentiles(end_latency, scale)}")
+    print(f"Games settled:         {len(recorder.settled)}")
+    print(f"  settled after end    {percentiles(settle_latency, scale)} "
+          f"(includes the {args.result_delay:.0f}s match-v5 result delay)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_timeline_arguments(parser)
+    parser.add_argument("--duration", type=float, default=300, help="Real seconds to run the poller for")
+    parser.add_argument("--time-scale", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4, help="Poll workers per region")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable
+
+from sqlalchemy.engine import Engine
+
+from models import LeagueOfLegendsAccount
+
+ACCOUNT_CHANGES_CHANNEL = "lol_account_changes"
+# Tags notifications sent by this process, so it can skip the ones it has already applied locally
+PROCESS_ID = uuid.uuid4().hex
+
+
+# In-memory copy of every linked League of Legends account, indexed by PUUID. Accounts are loaded once at
+# startup and then only reloaded when they change, so the poller never has to read them from the database.
+class AccountRegistry:
+    def __init__(self):
+        self.accounts: dict[int, LeagueOfLegendsAccount] = {}
+        self.accounts_by_puuid: dict[str, dict[int, LeagueOfLegendsAccount]] = {}
+
+    def replace_all(self, accounts: list[LeagueOfLegendsAccount]):
+        self.accounts.clear()
+        self.accounts_by_puuid.clear()
+        self.update(accounts)
+
+    def update(self, accounts: list[LeagueOfLegendsAccount]):
+        for account in accounts:
+            previous = self.accounts.get(account.id)
+            if previous is not None and previous.puuid != account.puuid:
+                linked = self.accounts_by_puuid[previous.puuid]
+                del linked[account.id]
+                if not linked:
+                    del self.accounts_by_puuid[previous.puuid]
+
+            self.accounts[account.id] = account
+            self.accounts_by_puuid.setdefault(account.puuid, {})[account.id] = account
+
+    def tracks(self, puuid: str) -> bool:
+        return puuid in self.accounts_by_puuid
+
+    def accounts_for(self, puuid: str) -> list[LeagueOfLegendsAccount]:
+        return list(self.accounts_by_puuid.get(puuid, {}).values())
+
+    def puuids_by_region(self) -> dict[str, set[str]]:
+        puuids_by_region = {}
+        for account in self.accounts.values():
+            puuids_by_region.setdefault(account.region, set()).add(account.puuid)
+        return puuids_by_region
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+
+# Keeps a dedicated PostgreSQL connection LISTENing for account changes made by other processes. The
+# connection is watched with loop.add_reader, so waiting for notifications costs nothing on the event loop.
+# on_connect runs every time LISTEN is (re-)established, since notifications sent while disconnected are lost.
+class AccountChangeListener:
+    def __init__(self, engine: Engine, on_change: Callable[[dict], Awaitable[None]],
+                 on_connect: Callable[[], Awaitable[None]], retry_delay: float = 5):
+        self.engine = engine
+        self.on_change = on_change
+        self.on_connect = on_connect
+        self.retry_delay = retry_delay
+        self.tasks: set[asyncio.Task] = set()
+
+    def _connect(self):
+        connect_args, connect_params = self.engine.dialect.create_connect_args(self.engine.url)
+        connection = self.engine.dialect.connect(*connect_args, **connect_params)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {ACCOUNT_CHANGES_CHANNEL}")
+        return connection
+
+    def _on_readable(self, connection, connection_lost: asyncio.Event):
+        try:
+            connection.poll()
+        except Exception as e:
+            logging.error(f"Lost account change listener connection: {e}")
+            connection_lost.set()
+            return
+
+        while connection.notifies:
+            notification = connection.notifies.pop(0)
+            try:
+                change = json.loads(notification.payload)
+            except ValueError:
+                logging.warning(f"Ignoring malformed account change notification: {notification.payload}")
+                continue
+            if change.pop('origin', None) == PROCESS_ID:
+                continue
+
+            task = asyncio.create_task(self.on_change(change))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                connection = await loop.run_in_executor(None, self._connect)
+            except Exception as e:
+                logging.error(f"Could not start account change listener: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            connection_lost = asyncio.Event()
+            loop.add_reader(connection.fileno(), self._on_readable, connection, connection_lost)
+            logging.info(f"Listening for account changes on {ACCOUNT_CHANGES_CHANNEL}")
+            try:
+                await self.on_connect()
+                await connection_lost.wait()
+            except Exception as e:
+                logging.error(f"Could not reload League of Legends accounts: {e}")
+            finally:
+                loop.remove_reader(connection.fileno())
+                connection.close()
+            await asyncio.sleep(self.retry_delay)
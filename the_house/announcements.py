@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+import aiohttp
+
+from config import ANNOUNCEMENT_TIMEOUT, ANNOUNCEMENT_ATTEMPTS, ANNOUNCEMENT_RETRY_DELAY
+from tracing import traced, span
+
+
+async def send_with_retry(description: str, send: Callable[[], Awaitable[Any]], idempotent: bool = False) -> Any | None:
+    # discord.py already retries 5xx responses itself. A timed out or dropped request may still have reached Discord,
+    # so only idempotent calls (message edits) are retried after one, new messages only when the connection failed.
+    # Anything else (missing permissions, deleted channel) will not succeed on a second try.
+    retried = (asyncio.TimeoutError, aiohttp.ClientError) if idempotent else aiohttp.ClientConnectorError
+    for attempt in range(1, ANNOUNCEMENT_ATTEMPTS + 1):
+        start = time.perf_counter()
+        try:
+            with span("discord.send", description=description, attempt=attempt):
+                result = await asyncio.wait_for(send(), ANNOUNCEMENT_TIMEOUT)
+        except retried as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logging.warning(f"Attempt {attempt}/{ANNOUNCEMENT_ATTEMPTS} to send {description} failed after "
+                            f"{elapsed_ms:.0f}ms: {e!r}")
+            if attempt < ANNOUNCEMENT_ATTEMPTS:
+                await asyncio.sleep(ANNOUNCEMENT_RETRY_DELAY * attempt)
+        except Exception as e:
+            logging.error(f"Could not send {description}: {e!r}")
+            return None
+        else:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logging.info(f"Sent {description} in {elapsed_ms:.0f}ms (attempt {attempt})")
+            return result
+    return None
+
+
+@traced("discord.fan_out")
+async def fan_out(sends: dict[str, Callable[[], Awaitable[Any]]], idempotent: bool = False) -> dict[str, Any | None]:
+    # Every channel is sent to concurrently, so one slow or failing guild doesn't hold up the others
+    start = time.perf_counter()
+    results = await asyncio.gather(*(send_with_retry(description, send, idempotent)
+                                     for description, send in sends.items()))
+    if sends:
+        logging.info(f"Fanned out {len(sends)} messages in {(time.perf_counter() - start) * 1000:.0f}ms, "
+                     f"{sum(result is not None for result in results)} delivered")
+    return dict(zip(sends, results))
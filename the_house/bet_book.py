@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+
+import discord
+
+
+@dataclass(slots=True)
+class Wager:
+    # users.id and guilds.id of the bettor's bank
+    user_id: int
+    guild_id: int
+    wagered_win: bool
+    amount: float
+
+
+# One announced game of a tracked player. Odds stay None until they have been calculated in the background.
+@dataclass(slots=True)
+class BetGame:
+    puuid: str
+    start_time: float
+    win_odds: float | None = None
+    lose_odds: float | None = None
+    messages: list[discord.Message] = field(default_factory=list)
+    wagers: list[Wager] = field(default_factory=list)
+    wagers_by_guild: dict[int, list[Wager]] = field(default_factory=dict)
+    wagers_by_user: dict[int, list[Wager]] = field(default_factory=dict)
+
+    def add(self, wager: Wager):
+        self.wagers.append(wager)
+        self.wagers_by_guild.setdefault(wager.guild_id, []).append(wager)
+        self.wagers_by_user.setdefault(wager.user_id, []).append(wager)
+
+    def wagers_for_guild(self, guild_id: int) -> list[Wager]:
+        return self.wagers_by_guild.get(guild_id, [])
+
+
+# Every game with open or unsettled bets, indexed by the player's PUUID. Games are opened when a game start is
+# announced and closed once they are settled, refunded or turn out to have no wagers.
+class BetBook:
+    def __init__(self):
+        self.games: dict[str, BetGame] = {}
+        self.wager_count = 0
+
+    def open(self, puuid: str, start_time: float) -> BetGame:
+        self.close(puuid)
+        game = BetGame(puuid, start_time)
+        self.games[puuid] = game
+        return game
+
+    def get(self, puuid: str) -> BetGame | None:
+        return self.games.get(puuid)
+
+    def is_open(self, game: BetGame) -> bool:
+        return self.games.get(game.puuid) is game
+
+    def place(self, game: BetGame, wager: Wager) -> bool:
+        # Fails once the game has been closed, e.g. when it was settled while the bettor was still choosing
+        if not self.is_open(game):
+            return False
+        game.add(wager)
+        self.wager_count += 1
+        return True
+
+    def close(self, puuid: str) -> BetGame | None:
+        game = self.games.pop(puuid, None)
+        if game is None:
+            return None
+        self.wager_count -= len(game.wagers)
+        return game
+
+    def __len__(self) -> int:
+        return len(self.games)
@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+
+DATA_DRAGON_URL = "https://ddragon.leagueoflegends.com"
+
+
+# Champion id -> name/icon lookup for a single Data Dragon version, persisted to disk so restarts don't
+# have to download champion.json again.
+class ChampionIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.version: str | None = None
+        self.champions: dict[int, dict] = {}
+        # Ids that were still missing after a refresh, not worth another refresh until the version changes
+        self.missing: set[int] = set()
+
+    def load(self) -> bool:
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read champion index from {self.path}: {e}")
+            return False
+
+        self.version = data['version']
+        self.champions = {int(champion_id): champion for champion_id, champion in data['champions'].items()}
+        logging.info(f"Loaded {len(self.champions)} champions for Data Dragon version {self.version}")
+        return True
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({'version': self.version, 'champions': self.champions}, file)
+        os.replace(temporary_path, self.path)
+
+    def update(self, version: str, champion_data: dict):
+        self.champions = {
+            int(champion_info['key']): {
+                'name': champion_info['name'],
+                'icon': f"{DATA_DRAGON_URL}/cdn/{version}/img/champion/{champion_info['image']['full']}",
+            }
+            for champion_info in champion_data.values()
+        }
+        self.version = version
+        self.missing.clear()
+        logging.info(f"Indexed {len(self.champions)} champions for Data Dragon version {version}")
+
+        try:
+            self.save()
+        except OSError as e:
+            logging.warning(f"Could not save champion index to {self.path}: {e}")
+
+    def get(self, champion_id: int) -> dict | None:
+        return self.champions.get(int(champion_id))
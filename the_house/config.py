@@ -5,4 +5,77 @@ load_dotenv()
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "false").lower() == "true"
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "5"))
+DATABASE_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+DATABASE_SLOW_QUERY_MS = float(os.getenv("DATABASE_SLOW_QUERY_MS", "0"))
 RIOT_API_KEY = os.getenv('RIOT_API_KEY')
+# {routing} is replaced with the platform (na1, euw1, ...) or regional (americas, europe, ...) routing value
+RIOT_API_BASE_URL = os.getenv("RIOT_API_BASE_URL", "https://{routing}.api.riotgames.com")
+
+HTTP_CONNECTION_LIMIT = int(os.getenv("HTTP_CONNECTION_LIMIT", "100"))
+HTTP_CONNECTION_LIMIT_PER_HOST = int(os.getenv("HTTP_CONNECTION_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+RIOT_APP_RATE_LIMIT = os.getenv("RIOT_APP_RATE_LIMIT", "20:1,100:120")
+RIOT_MAX_RETRIES = int(os.getenv("RIOT_MAX_RETRIES", "3"))
+
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "2000"))
+
+ODDS_MATCH_WINDOW = int(os.getenv("ODDS_MATCH_WINDOW", "20"))
+# Odds are calculated in the background after a game start is announced
+ODDS_CONCURRENCY = int(os.getenv("ODDS_CONCURRENCY", "4"))
+ODDS_TIMEOUT = float(os.getenv("ODDS_TIMEOUT", "60"))
+
+# Game announcements are sent to every linked guild concurrently, each send with its own timeout. Odds edits are
+# retried after a timeout, new messages only when the connection to Discord failed.
+ANNOUNCEMENT_TIMEOUT = float(os.getenv("ANNOUNCEMENT_TIMEOUT", "3"))
+ANNOUNCEMENT_ATTEMPTS = int(os.getenv("ANNOUNCEMENT_ATTEMPTS", "3"))
+ANNOUNCEMENT_RETRY_DELAY = float(os.getenv("ANNOUNCEMENT_RETRY_DELAY", "1"))
+
+POLL_WORKERS_PER_REGION = int(os.getenv("POLL_WORKERS_PER_REGION", "4"))
+ACCOUNT_REFRESH_INTERVAL = float(os.getenv("ACCOUNT_REFRESH_INTERVAL", "60"))
+BET_WINDOW_MINUTES = int(os.getenv("BET_WINDOW_MINUTES", "4"))
+
+# Seconds between polls of a single account, depending on what it was last seen doing
+POLL_INTERVAL_JUST_STARTED = float(os.getenv("POLL_INTERVAL_JUST_STARTED", "20"))
+POLL_INTERVAL_IN_GAME = float(os.getenv("POLL_INTERVAL_IN_GAME", "15"))
+POLL_INTERVAL_RECENTLY_ACTIVE = float(os.getenv("POLL_INTERVAL_RECENTLY_ACTIVE", "10"))
+POLL_INTERVAL_IDLE = float(os.getenv("POLL_INTERVAL_IDLE", "30"))
+POLL_INTERVAL_LONG_IDLE = float(os.getenv("POLL_INTERVAL_LONG_IDLE", "120"))
+POLL_INTERVAL_NEVER_SEEN = float(os.getenv("POLL_INTERVAL_NEVER_SEEN", "30"))
+POLL_INTERVAL_AWAITING_RESULT = float(os.getenv("POLL_INTERVAL_AWAITING_RESULT", "30"))
+RECENTLY_ACTIVE_SECONDS = float(os.getenv("RECENTLY_ACTIVE_SECONDS", "3600"))
+LONG_IDLE_SECONDS = float(os.getenv("LONG_IDLE_SECONDS", "21600"))
+# Bets are refunded if match-v5 still has no result this many seconds after the live game disappeared
+MATCH_RESULT_TIMEOUT = float(os.getenv("MATCH_RESULT_TIMEOUT", "1800"))
+# A spectator response seen by one player of a game is reused for their tracked teammates for this many seconds
+LIVE_GAME_MAX_AGE = float(os.getenv("LIVE_GAME_MAX_AGE", "10"))
+
+# Prometheus metrics are served on http://METRICS_HOST:METRICS_PORT/metrics, a port of 0 turns them off
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+
+# Spans for commands, the game start flow, database, Riot and Discord calls are appended to TRACE_FILE as JSON
+# lines when it is set. Spans shorter than TRACE_MIN_MS are not written.
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_MIN_MS = float(os.getenv("TRACE_MIN_MS", "0"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "1"))
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+CHAMPION_INDEX_PATH = os.getenv("CHAMPION_INDEX_PATH", os.path.join(DATA_DIR, "champion_index.json"))
+CHAMPION_INDEX_REFRESH_INTERVAL = float(os.getenv("CHAMPION_INDEX_REFRESH_INTERVAL", "3600"))
+# Output of the bot owner's /profile command
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "120"))
+
+RIOT_ID_TTL = float(os.getenv("RIOT_ID_TTL", str(7 * 24 * 3600)))
+
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "3600"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "5000"))
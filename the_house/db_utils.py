@@ -1,52 +1,135 @@
-from models import User, LeagueOfLegendsAccount, Guild, Bank
-from services import services, logging
-
-
-def create_user(discord_account_id: int):
+import asyncio
+import functools
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, Integer, and_, case, column, func, select, true, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+
+from account_registry import ACCOUNT_CHANGES_CHANNEL, PROCESS_ID
+from metrics import DB_CALL_DURATION, DB_EXECUTOR_WAIT
+from models import User, LeagueOfLegendsAccount, Guild, Bank, LeagueOfLegendsMatch, LeagueOfLegendsMatchResult
+from services import services, logging, SessionLocal
+from tracing import span
+
+NEVER_CLAIMED = datetime(1970, 1, 1)
+
+
+def run_in_session_scope(queued_at: float, operation, *args, **kwargs):
+    # Every call is its own unit of work: the thread's session is rolled back on error and always
+    # closed afterwards so its connection goes back to the pool
+    start = time.perf_counter()
+    DB_EXECUTOR_WAIT.observe(start - queued_at, function=operation.__name__)
+    try:
+        return operation(*args, **kwargs)
+    except Exception:
+        services.db.rollback()
+        raise
+    finally:
+        SessionLocal.remove()
+        DB_CALL_DURATION.observe(time.perf_counter() - start, function=operation.__name__)
+
+
+def run_in_db_executor(operation):
+    # Database calls are blocking, run them on the database thread pool so they never stall the event loop
+    @functools.wraps(operation)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with span(f"db.{operation.__name__}"):
+            return await loop.run_in_executor(
+                services.db_executor,
+                functools.partial(run_in_session_scope, time.perf_counter(), operation, *args, **kwargs),
+            )
+
+    return wrapper
+
+
+def _notify_account_change(db, **change):
+    # Sent inside the caller's transaction, so listeners in other processes only hear about committed changes
+    if db.bind.dialect.name == "postgresql":
+        db.execute(select(func.pg_notify(ACCOUNT_CHANGES_CHANNEL, json.dumps({**change, 'origin': PROCESS_ID}))))
+
+
+@run_in_db_executor
+def get_users_by_user_table_ids(user_ids: list[int]) -> dict[int, User]:
     db = services.db
-    user = User(discord_account_id=discord_account_id)
-    db.add(user)
-    db.commit()
-    return user
+    users = db.query(User).filter(User.id.in_(user_ids)).all() if user_ids else []
+    return {user.id: user for user in users}
 
 
-def get_user_by_user_table_id(user_id: int):
-    db = services.db
-    return db.query(User).filter(User.id == user_id).first()
-
-
-def get_user_by_discord_account_id(discord_account_id: int):
-    db = services.db
-    return db.query(User).filter(User.discord_account_id == discord_account_id).first()
+def _select_member(db, discord_account_id: int, guild_id: int):
+    return db.execute(
+        select(User, Guild, Bank)
+        .join_from(User, Guild, true())
+        .outerjoin(Bank, and_(Bank.user_id == User.id, Bank.guild_id == Guild.id))
+        .options(contains_eager(Bank.user), contains_eager(Bank.guild))
+        .where(User.discord_account_id == discord_account_id, Guild.guild_id == guild_id)
+    ).unique().first()
 
 
-def create_guild(guild_id: int):
+@run_in_db_executor
+def resolve_member(discord_account_id: int, guild_id: int, with_bank: bool = True) -> tuple[User, Guild, Bank | None]:
+    # Steady state is a single joined SELECT; missing rows are created with INSERT ... ON CONFLICT DO NOTHING
+    # (safe against concurrent commands) and then selected again, all in one commit
     db = services.db
-    guild = Guild(guild_id=guild_id)
-    db.add(guild)
+    row = _select_member(db, discord_account_id, guild_id)
+    if row and (row.Bank or not with_bank):
+        return row.User, row.Guild, row.Bank
+
+    db.execute(insert(User).values(discord_account_id=discord_account_id).on_conflict_do_nothing(
+        index_elements=[User.discord_account_id]
+    ))
+    db.execute(insert(Guild).values(guild_id=guild_id).on_conflict_do_nothing(index_elements=[Guild.guild_id]))
+    if with_bank:
+        db.execute(insert(Bank).from_select(
+            [Bank.user_id, Bank.guild_id],
+            select(User.id, Guild.id)
+            .join_from(User, Guild, true())
+            .where(User.discord_account_id == discord_account_id, Guild.guild_id == guild_id)
+        ).on_conflict_do_nothing(constraint='_user_guild_bank_uc'))
     db.commit()
-    return guild
 
+    row = _select_member(db, discord_account_id, guild_id)
+    return row.User, row.Guild, row.Bank
 
-def create_bank(user_id: int, guild_id: int):
+
+@run_in_db_executor
+def resolve_guild(guild_id: int) -> Guild:
     db = services.db
-    bank = Bank(user_id=user_id, guild_id=guild_id)
-    db.add(bank)
+    guild = db.query(Guild).filter(Guild.guild_id == guild_id).first()
+    if guild:
+        return guild
+
+    db.execute(insert(Guild).values(guild_id=guild_id).on_conflict_do_nothing(index_elements=[Guild.guild_id]))
     db.commit()
-    return bank
+    return db.query(Guild).filter(Guild.guild_id == guild_id).one()
 
 
-def get_bank_by_user_and_guild(user_id: int, guild_id: int):
+@run_in_db_executor
+def set_guild_channel(guild_id: int, channel_id: int):
     db = services.db
-    return db.query(Bank).filter_by(user_id=user_id, guild_id=guild_id).first()
+    for guild_table_id in db.execute(
+            update(Guild).where(Guild.guild_id == guild_id).values(channel_id=channel_id).returning(Guild.id)
+    ).scalars():
+        _notify_account_change(db, guild_id=guild_table_id)
+    db.commit()
 
 
-def get_guild_by_guild_id(guild_id: int):
+@run_in_db_executor
+def set_guild_currency(guild_id: int, currency: str):
     db = services.db
-    return db.query(Guild).filter(Guild.guild_id == guild_id).first()
+    for guild_table_id in db.execute(
+            update(Guild).where(Guild.guild_id == guild_id).values(currency=currency).returning(Guild.id)
+    ).scalars():
+        _notify_account_change(db, guild_id=guild_table_id)
+    db.commit()
 
 
-def set_lol_account(user_id: int, guild_id: int, region: str, puuid: str):
+@run_in_db_executor
+def set_lol_account(user_id: int, guild_id: int, region: str, puuid: str, game_name: str = None,
+                    tag_line: str = None):
     db = services.db
     existing_account = db.query(LeagueOfLegendsAccount).filter_by(
         user_id=user_id,
@@ -56,18 +139,37 @@ def set_lol_account(user_id: int, guild_id: int, region: str, puuid: str):
     if existing_account:
         existing_account.region = region
         existing_account.puuid = puuid
-        db.commit()
+        existing_account.game_name = game_name
+        existing_account.tag_line = tag_line
+        existing_account.riot_id_updated_at = datetime.utcnow()
     else:
         new_account = LeagueOfLegendsAccount(
             user_id=user_id,
             guild_id=guild_id,
             region=region,
-            puuid=puuid
+            puuid=puuid,
+            game_name=game_name,
+            tag_line=tag_line,
+            riot_id_updated_at=datetime.utcnow()
         )
         db.add(new_account)
-        db.commit()
+    _notify_account_change(db, user_id=user_id, guild_id=guild_id)
+    db.commit()
 
 
+@run_in_db_executor
+def set_riot_id_by_puuid(puuid: str, game_name: str, tag_line: str):
+    db = services.db
+    db.query(LeagueOfLegendsAccount).filter_by(puuid=puuid).update({
+        LeagueOfLegendsAccount.game_name: game_name,
+        LeagueOfLegendsAccount.tag_line: tag_line,
+        LeagueOfLegendsAccount.riot_id_updated_at: datetime.utcnow()
+    })
+    _notify_account_change(db, puuid=puuid)
+    db.commit()
+
+
+@run_in_db_executor
 def get_lol_account(user_id: int, guild_id: int):
     db = services.db
     account = db.query(LeagueOfLegendsAccount).filter_by(
@@ -78,66 +180,162 @@ def get_lol_account(user_id: int, guild_id: int):
     return account
 
 
+@run_in_db_executor
+def get_lol_account_by_discord_account_id(discord_account_id: int, guild_id: int) -> LeagueOfLegendsAccount | None:
+    db = services.db
+    return (
+        db.query(LeagueOfLegendsAccount)
+        .join(User, LeagueOfLegendsAccount.user_id == User.id)
+        .filter(User.discord_account_id == discord_account_id, LeagueOfLegendsAccount.guild_id == guild_id)
+        .first()
+    )
+
+
+@run_in_db_executor
 def get_lol_accounts_by_puuid(puuid: str):
     db = services.db
     accounts = db.query(LeagueOfLegendsAccount).filter_by(puuid=puuid).all()
     return accounts
 
 
-def get_all_unique_puuids():
+@run_in_db_executor
+def get_lol_accounts_by_guild_id(guild_id: int) -> list[LeagueOfLegendsAccount]:
     db = services.db
-    puuids = db.query(LeagueOfLegendsAccount.puuid).distinct().all()
-    return {result[0] for result in puuids}
+    return db.query(LeagueOfLegendsAccount).filter_by(guild_id=guild_id).all()
 
 
-def get_region_by_puuid(puuid: str) -> str:
+@run_in_db_executor
+def get_all_league_of_legends_accounts() -> list[LeagueOfLegendsAccount]:
     db = services.db
-    account = db.query(LeagueOfLegendsAccount).filter_by(puuid=puuid).first()
-
-    if account:
-        return account.region
-    else:
-        return ""
+    return db.query(LeagueOfLegendsAccount).all()
 
 
-def get_lol_accounts_by_guild_id(guild_id: int) -> list[LeagueOfLegendsAccount]:
+@run_in_db_executor
+def debit_bank_coins(user_id: int, guild_id: int, amount: float) -> float | None:
+    # Returns the new balance, or None when the bank does not exist or cannot cover the amount
     db = services.db
-    return db.query(LeagueOfLegendsAccount).filter_by(guild_id=guild_id).all()
+    coins = db.execute(
+        update(Bank)
+        .where(Bank.user_id == user_id, Bank.guild_id == guild_id, Bank.coins >= amount)
+        .values(coins=Bank.coins - amount)
+        .returning(Bank.coins),
+        execution_options={'synchronize_session': False}
+    ).scalar()
+    db.commit()
+    return coins
 
 
-def get_all_league_of_legends_accounts() -> list[LeagueOfLegendsAccount]:
+@run_in_db_executor
+def claim_daily_reward(user_id: int, guild_id: int, claimed_at: datetime, coins_per_streak_day: int,
+                       streak_reset_after: timedelta) -> dict | None:
+    # Only succeeds once per UTC day, even for concurrent claims. The streak resets to 1 when the previous claim is
+    # older than streak_reset_after, otherwise it grows by one and the payout is streak * coins_per_streak_day.
     db = services.db
-    return db.query(LeagueOfLegendsAccount).all()
+    previous = aliased(Bank)
+    day_start = datetime.combine(claimed_at.date(), datetime.min.time())
+    missed_streak = and_(Bank.last_daily > NEVER_CLAIMED, Bank.last_daily < claimed_at - streak_reset_after)
+    current_streak = case((missed_streak, 1), else_=Bank.current_streak + 1)
+
+    row = db.execute(
+        update(Bank)
+        .where(Bank.id == previous.id, Bank.user_id == user_id, Bank.guild_id == guild_id,
+               Bank.last_daily < day_start)
+        .values(
+            current_streak=current_streak,
+            max_streak=case((missed_streak, Bank.max_streak), else_=func.greatest(Bank.max_streak, current_streak)),
+            coins=Bank.coins + current_streak * coins_per_streak_day,
+            last_daily=claimed_at
+        )
+        .returning(Bank.coins, Bank.current_streak, Bank.max_streak, previous.last_daily, previous.max_streak),
+        execution_options={'synchronize_session': False}
+    ).first()
+    db.commit()
 
+    if row is None:
+        return None
+    return {
+        'coins': row[0],
+        'current_streak': row[1],
+        'max_streak': row[2],
+        'previous_last_daily': row[3],
+        'previous_max_streak': row[4],
+        'coins_earned': row[1] * coins_per_streak_day,
+    }
 
-def set_bank_coins(user_id: int, guild_id: int, coins: int):
-    db = services.db
-    bank = db.query(Bank).filter_by(user_id=user_id, guild_id=guild_id).first()
-    if bank:
-        bank.coins = coins
-        db.commit()
-    else:
-        logging.error(f"Bank not found for user_id {user_id} and guild_id {guild_id}")
 
+@run_in_db_executor
+def apply_bank_coin_deltas(deltas: dict[tuple[int, int], float]) -> dict[tuple[int, int], float]:
+    # Applies every (user_id, guild_id) -> delta change in one UPDATE ... FROM (VALUES ...) statement and commit
+    if not deltas:
+        return {}
 
-def increment_multiple_bank_coins(banks: list[Bank], coins: float):
     db = services.db
-    for bank in banks:
-        bank.coins += coins
+    changes = values(
+        column('user_id', Integer), column('guild_id', Integer), column('delta', Float), name='changes'
+    ).data([(user_id, guild_id, delta) for (user_id, guild_id), delta in deltas.items()])
+
+    rows = db.execute(
+        update(Bank)
+        .where(Bank.user_id == changes.c.user_id, Bank.guild_id == changes.c.guild_id)
+        .values(coins=Bank.coins + changes.c.delta)
+        .returning(Bank.user_id, Bank.guild_id, Bank.coins),
+        execution_options={'synchronize_session': False}
+    ).all()
     db.commit()
 
+    missing = set(deltas) - {(user_id, guild_id) for user_id, guild_id, _ in rows}
+    if missing:
+        logging.error(f"Banks not found for (user_id, guild_id) pairs {missing}")
+
+    return {(user_id, guild_id): coins for user_id, guild_id, coins in rows}
+
 
-def get_banks_sorted_by_coins_for_guild(guild_id: int) -> list:
+@run_in_db_executor
+def get_banks_sorted_by_coins_for_guild(guild_id: int, limit: int = None) -> list:
     db = services.db
     sorted_banks = (
         db.query(Bank)
+        .options(joinedload(Bank.user))
         .filter(Bank.guild_id == guild_id)
         .order_by(Bank.coins.desc())
+        .limit(limit)
         .all()
     )
     return sorted_banks
 
 
-def get_all_banks() -> list[Bank]:
+@run_in_db_executor
+def get_match_details_by_match_id(match_id: str) -> dict | None:
     db = services.db
-    return db.query(Bank).all()
+    match = db.get(LeagueOfLegendsMatch, match_id)
+    return match.details if match else None
+
+
+@run_in_db_executor
+def save_match_details(match_id: str, details: dict):
+    db = services.db
+    db.execute(insert(LeagueOfLegendsMatch).values(match_id=match_id, details=details).on_conflict_do_nothing(
+        index_elements=['match_id']
+    ))
+    db.commit()
+
+
+@run_in_db_executor
+def get_recent_match_results(puuid: str, queue_id: int | None, limit: int) -> list[LeagueOfLegendsMatchResult]:
+    db = services.db
+    query = db.query(LeagueOfLegendsMatchResult).filter(LeagueOfLegendsMatchResult.puuid == puuid)
+    if queue_id is not None:
+        query = query.filter(LeagueOfLegendsMatchResult.queue_id == queue_id)
+    return query.order_by(LeagueOfLegendsMatchResult.game_end_timestamp.desc()).limit(limit).all()
+
+
+@run_in_db_executor
+def save_match_results(results: list[dict]):
+    if not results:
+        return
+
+    db = services.db
+    db.execute(insert(LeagueOfLegendsMatchResult).values(results).on_conflict_do_nothing(
+        constraint='_puuid_match_result_uc'
+    ))
+    db.commit()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import discord
+
+
+@dataclass(frozen=True, slots=True)
+class Identity:
+    id: int
+    display_name: str
+    display_avatar: str
+
+
+# Resolves Discord display names and avatars from the gateway member/user cache first, then from a bounded
+# TTL cache, and only falls back to REST fetch_user calls (issued concurrently) for whatever is left.
+class IdentityCache:
+    def __init__(self, bot: discord.Client, ttl: float, max_size: int, max_concurrent_fetches: int = 5):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_size = max_size
+        self.identities: OrderedDict[tuple[int, int | None], tuple[float, Identity]] = OrderedDict()
+        self.fetch_semaphore = asyncio.Semaphore(max_concurrent_fetches)
+
+    def _remember(self, key: tuple[int, int | None], identity: Identity):
+        self.identities[key] = (time.monotonic() + self.ttl, identity)
+        self.identities.move_to_end(key)
+        while len(self.identities) > self.max_size:
+            self.identities.popitem(last=False)
+
+    def _from_cache(self, key: tuple[int, int | None]) -> Identity | None:
+        cached = self.identities.get(key)
+        if cached is None:
+            return None
+        expires_at, identity = cached
+        if expires_at < time.monotonic():
+            del self.identities[key]
+            return None
+        self.identities.move_to_end(key)
+        return identity
+
+    def _from_gateway(self, discord_id: int, guild_id: int | None) -> Identity | None:
+        user = None
+        if guild_id is not None:
+            guild = self.bot.get_guild(guild_id)
+            if guild:
+                user = guild.get_member(discord_id)
+        if user is None:
+            user = self.bot.get_user(discord_id)
+        if user is None:
+            return None
+        return Identity(user.id, user.display_name, str(user.display_avatar))
+
+    def get(self, discord_id: int, guild_id: int | None = None) -> Identity | None:
+        key = (discord_id, guild_id)
+        identity = self._from_cache(key) or self._from_gateway(discord_id, guild_id)
+        if identity:
+            self._remember(key, identity)
+        return identity
+
+    async def _fetch(self, discord_id: int) -> Identity | None:
+        async with self.fetch_semaphore:
+            try:
+                user = await self.bot.fetch_user(discord_id)
+            except discord.HTTPException as e:
+                logging.error(f"Could not fetch Discord user {discord_id}: {e}")
+                return None
+        return Identity(user.id, user.display_name, str(user.display_avatar))
+
+    async def resolve(self, discord_id: int, guild_id: int | None = None) -> Identity | None:
+        return (await self.resolve_many([discord_id], guild_id)).get(discord_id)
+
+    async def resolve_many(self, discord_ids: list[int], guild_id: int | None = None) -> dict[int, Identity]:
+        identities = {}
+        missing = []
+        for discord_id in dict.fromkeys(discord_ids):
+            identity = self.get(discord_id, guild_id)
+            if identity:
+                identities[discord_id] = identity
+            else:
+                missing.append(discord_id)
+
+        if missing:
+            for discord_id, identity in zip(missing, await asyncio.gather(*(self._fetch(i) for i in missing))):
+                if identity:
+                    self._remember((discord_id, guild_id), identity)
+                    identities[discord_id] = identity
+
+        return identities
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable
+
+from lol_api_utils import get_match_id
+
+
+# Concurrent calls for the same key share one in-flight request instead of each sending their own.
+class SingleFlight:
+    def __init__(self):
+        self.flights: dict[Hashable, asyncio.Future] = {}
+
+    def _forget(self, key: Hashable, flight: asyncio.Future):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        # Marks the error as retrieved even if every caller was cancelled, the callers still see it if they await
+        if not flight.cancelled():
+            flight.exception()
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(fetch())
+            self.flights[key] = flight
+            flight.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded so a cancelled caller doesn't cancel the request for everyone else waiting on it
+        return await asyncio.shield(flight)
+
+    def __len__(self) -> int:
+        return len(self.flights)
+
+
+@dataclass(slots=True)
+class LiveGame:
+    game_id: int
+    match_id: str
+    region: str
+    details: dict
+    checked_at: float
+    ended: bool = False
+    puuids: set[str] = field(default_factory=set)
+
+
+# Live games keyed by spectator gameId, with every tracked player seen in them. One spectator response
+# updates all tracked participants of a game, so teammates share a single request.
+class LiveGameRegistry:
+    def __init__(self):
+        self.games: dict[int, LiveGame] = {}
+        self.game_by_puuid: dict[str, int] = {}
+        self.requests = SingleFlight()
+
+    def game_for(self, puuid: str) -> LiveGame | None:
+        game_id = self.game_by_puuid.get(puuid)
+        return self.games.get(game_id) if game_id is not None else None
+
+    def observe(self, live_match_details: dict, region: str, is_tracked: Callable[[str], bool]) -> set[str]:
+        # Returns the tracked participants that were not linked to this game before
+        game_id = live_match_details['gameId']
+        game = self.games.get(game_id)
+        if game is None:
+            game = LiveGame(game_id, get_match_id(live_match_details, region), region, live_match_details,
+                            time.monotonic())
+            self.games[game_id] = game
+        else:
+            game.details = live_match_details
+            game.checked_at = time.monotonic()
+
+        linked = set()
+        for participant in live_match_details.get('participants', []):
+            puuid = participant.get('puuid')
+            if puuid and puuid not in game.puuids and is_tracked(puuid):
+                self.release(puuid)
+                game.puuids.add(puuid)
+                self.game_by_puuid[puuid] = game_id
+                linked.add(puuid)
+        return linked
+
+    def mark_ended(self, game_id: int):
+        game = self.games.get(game_id)
+        if game:
+            game.ended = True
+
+    def release(self, puuid: str):
+        game_id = self.game_by_puuid.pop(puuid, None)
+        game = self.games.get(game_id) if game_id is not None else None
+        if game:
+            game.puuids.discard(puuid)
+            if not game.puuids:
+                del self.games[game_id]
+
+    def prune(self, max_age: float):
+        # Drops games nobody has checked on for a while, e.g. when their players stopped being tracked
+        now = time.monotonic()
+        for game in [game for game in self.games.values() if now - game.checked_at > max_age]:
+            for puuid in list(game.puuids):
+                self.release(puuid)
+            self.games.pop(game.game_id, None)
+
+    def __len__(self) -> int:
+        return len(self.games)
@@ -1,6 +1,12 @@
-import aiohttp
-from config import RIOT_API_KEY
-from services import logging
+import asyncio
+import time
+
+from champion_index import ChampionIndex, DATA_DRAGON_URL
+from config import RIOT_API_KEY, RIOT_API_BASE_URL, RIOT_MAX_RETRIES, CHAMPION_INDEX_PATH
+from match_cache import match_cache
+from metrics import RIOT_REQUEST_DURATION, RIOT_RATE_LIMIT_WAIT, RIOT_RESPONSES
+from services import services, logging
+from tracing import span
 
 CONTINENT_TO_REGION = {
     "na1": "americas",
@@ -22,62 +28,134 @@ CONTINENT_TO_REGION = {
     "vn2": "sea"
 }
 
+champion_index = ChampionIndex(CHAMPION_INDEX_PATH)
+
+
+class RiotApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Failed to fetch data: {status}, {message}")
+        self.status = status
+
+
+def get_riot_api_url(routing: str, path: str) -> str:
+    return f"{RIOT_API_BASE_URL.format(routing=routing)}{path}"
+
+
+async def fetch_json(url, routing: str = None, method: str = None):
+    # Riot API calls pass their routing value (platform or region) and method so the rate limiter can pace them
+    rate_limiter = services.rate_limiter
+    method_label = method or "other"
+
+    with span(f"riot.{method_label}", routing=routing) as request_span:
+        for attempt in range(RIOT_MAX_RETRIES + 1):
+            if routing and method:
+                start = time.perf_counter()
+                await rate_limiter.acquire(routing, method)
+                RIOT_RATE_LIMIT_WAIT.observe(time.perf_counter() - start, method=method_label)
 
-async def fetch_json(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status != 200:
-                logging.error(f"Failed to fetch data: {response.status}, {await response.text()}")
-                raise Exception(f"Failed to fetch data: {response.status}, {await response.text()}")
-            return await response.json()
+            start = time.perf_counter()
+            try:
+                response = await services.http.session.get(url)
+            except Exception:
+                RIOT_RESPONSES.inc(method=method_label, status="error")
+                raise
+            async with response:
+                RIOT_REQUEST_DURATION.observe(time.perf_counter() - start, method=method_label)
+                RIOT_RESPONSES.inc(method=method_label, status=response.status)
+                request_span.attributes['status'] = response.status
+                request_span.attributes['attempts'] = attempt + 1
+                if routing and method:
+                    rate_limiter.update_from_headers(routing, method, response.headers)
+
+                if response.status == 429 and routing and method and attempt < RIOT_MAX_RETRIES:
+                    await asyncio.sleep(rate_limiter.handle_rate_limited(routing, method, response.headers))
+                    continue
+
+                if response.status != 200:
+                    message = await response.text()
+                    if response.status != 404:
+                        logging.error(f"Failed to fetch data: {response.status}, {message}")
+                    raise RiotApiError(response.status, message)
+                return await response.json()
 
 
 async def get_account_by_riot_id(username: str, tag_line: str, region: str) -> dict:
     continent = CONTINENT_TO_REGION.get(region)
-    url = f"https://{continent}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{username}/{tag_line}?api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
+    url = get_riot_api_url(continent, f"/riot/account/v1/accounts/by-riot-id/{username}/{tag_line}?api_key={RIOT_API_KEY}")
+    return await fetch_json(url, routing=continent, method="account-v1.by-riot-id")
 
 
 async def get_account_info_by_puuid(puuid: str, region: str) -> dict:
     continent = CONTINENT_TO_REGION.get(region)
-    url = f"https://{continent}.api.riotgames.com/riot/account/v1/accounts/by-puuid/{puuid}?api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
+    url = get_riot_api_url(continent, f"/riot/account/v1/accounts/by-puuid/{puuid}?api_key={RIOT_API_KEY}")
+    return await fetch_json(url, routing=continent, method="account-v1.by-puuid")
 
 
 async def get_summoner_by_puuid(puuid: str, region: str) -> dict:
-    url = f"https://{region}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}?api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
+    url = get_riot_api_url(region, f"/lol/summoner/v4/summoners/by-puuid/{puuid}?api_key={RIOT_API_KEY}")
+    return await fetch_json(url, routing=region, method="summoner-v4.by-puuid")
 
 
-async def get_match_ids_by_puuid(puuid: str, region: str, count: int, start=0, queue_id=None) -> list:
+async def get_match_ids_by_puuid(puuid: str, region: str, count: int, start=0, queue_id=None,
+                                 start_time: int = None) -> list:
     continent = CONTINENT_TO_REGION.get(region)
+    filters = ""
     if queue_id is not None:
-        url = f"https://{continent}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?queue={queue_id}&start={start}&count={count}&api_key={RIOT_API_KEY}"
-    else:
-        url = f"https://{continent}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}&api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
+        filters += f"queue={queue_id}&"
+    if start_time is not None:
+        filters += f"startTime={start_time}&"
+    url = get_riot_api_url(continent, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?{filters}start={start}&count={count}&api_key={RIOT_API_KEY}")
+    return await fetch_json(url, routing=continent, method="match-v5.ids-by-puuid")
 
 
 async def get_match_details(match_id: str, region: str) -> dict:
+    cached_details = await match_cache.get(match_id)
+    if cached_details is not None:
+        return cached_details
+
     continent = CONTINENT_TO_REGION.get(region)
-    url = f"https://{continent}.api.riotgames.com/lol/match/v5/matches/{match_id}?api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
+    url = get_riot_api_url(continent, f"/lol/match/v5/matches/{match_id}?api_key={RIOT_API_KEY}")
+    details = await fetch_json(url, routing=continent, method="match-v5.match")
+    return await match_cache.put(match_id, details)
 
 
 async def get_live_match_details(puuid: str, region: str) -> dict:
-    url = f"https://{region}.api.riotgames.com/lol/spectator/v5/active-games/by-summoner/{puuid}?api_key={RIOT_API_KEY}"
-    return await fetch_json(url)
-
-
-async def get_champion_icon(champion_id: int, version: str = "14.14.1") -> str:
-    url = f"https://ddragon.leagueoflegends.com/cdn/{version}/data/en_US/champion.json"
-    data = await fetch_json(url)
-
-    champion_data = data.get("data", {})
-    for champion_name, champion_info in champion_data.items():
-        if champion_info.get("key") == str(champion_id):
-            image_filename = champion_info["image"]["full"]
-            return f"https://ddragon.leagueoflegends.com/cdn/{version}/img/champion/{image_filename}"
-
-    logging.error("Champion ID not found")
-    raise Exception("Champion ID not found")
+    # spectator-v5 answers 404 when the player is not in a game
+    url = get_riot_api_url(region, f"/lol/spectator/v5/active-games/by-summoner/{puuid}?api_key={RIOT_API_KEY}")
+    try:
+        return await fetch_json(url, routing=region, method="spectator-v5.by-summoner")
+    except RiotApiError as e:
+        if e.status == 404:
+            return {}
+        raise
+
+
+def get_match_id(live_match_details: dict, region: str) -> str:
+    # match-v5 ids are the platform id and the spectator gameId, e.g. NA1_4960000000
+    platform_id = live_match_details.get('platformId') or region
+    return f"{platform_id.upper()}_{live_match_details['gameId']}"
+
+
+async def refresh_champion_index():
+    versions = await fetch_json(f"{DATA_DRAGON_URL}/api/versions.json")
+    latest_version = versions[0]
+    if latest_version == champion_index.version:
+        return
+
+    data = await fetch_json(f"{DATA_DRAGON_URL}/cdn/{latest_version}/data/en_US/champion.json")
+    champion_index.update(latest_version, data.get("data", {}))
+
+
+async def get_champion_icon(champion_id: int) -> str:
+    champion = champion_index.get(champion_id)
+    if champion is None and int(champion_id) not in champion_index.missing:
+        # Either the index has never been built or a champion was released since the last refresh
+        await refresh_champion_index()
+        champion = champion_index.get(champion_id)
+        if champion is None:
+            champion_index.missing.add(int(champion_id))
+
+    if champion is None:
+        logging.error("Champion ID not found")
+        raise Exception("Champion ID not found")
+    return champion['icon']
@@ -0,0 +1,89 @@
+import logging
+from collections import OrderedDict
+
+from config import MATCH_CACHE_SIZE
+from db_utils import get_match_details_by_match_id, save_match_details
+
+
+def trim_match_details(details: dict) -> dict:
+    # Settling bets and calculating odds only read these fields, the rest of a match-v5 document is dropped
+    info = details.get('info', {})
+    return {
+        'metadata': {'matchId': details.get('metadata', {}).get('matchId')},
+        'info': {
+            'queueId': info.get('queueId'),
+            'gameEndTimestamp': info.get('gameEndTimestamp'),
+            'participants': [
+                {
+                    'puuid': participant.get('puuid'),
+                    'win': participant.get('win'),
+                    'gameEndedInEarlySurrender': participant.get('gameEndedInEarlySurrender'),
+                }
+                for participant in info.get('participants', [])
+            ],
+        },
+    }
+
+
+# Finished matches never change, so match-v5 details are kept in a bounded in-memory LRU backed by the
+# league_of_legends_matches table, which survives restarts.
+class MatchCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.matches: OrderedDict[str, dict] = OrderedDict()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def _remember(self, match_id: str, details: dict):
+        self.matches[match_id] = details
+        self.matches.move_to_end(match_id)
+        while len(self.matches) > self.max_size:
+            self.matches.popitem(last=False)
+
+    async def get(self, match_id: str) -> dict | None:
+        details = self.matches.get(match_id)
+        if details is not None:
+            self.matches.move_to_end(match_id)
+            self.memory_hits += 1
+            return details
+
+        try:
+            details = await get_match_details_by_match_id(match_id)
+        except Exception as e:
+            logging.error(f"Could not read match {match_id} from the match store: {e}")
+            details = None
+
+        if details is not None:
+            self._remember(match_id, details)
+            self.store_hits += 1
+            return details
+
+        self.misses += 1
+        return None
+
+    async def put(self, match_id: str, details: dict) -> dict:
+        # Only completed matches are immutable
+        if not details.get('info', {}).get('gameEndTimestamp'):
+            return details
+
+        details = trim_match_details(details)
+        self._remember(match_id, details)
+        try:
+            await save_match_details(match_id, details)
+        except Exception as e:
+            logging.error(f"Could not save match {match_id} to the match store: {e}")
+        return details
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        return {
+            'size': len(self.matches),
+            'memory_hits': self.memory_hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.store_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+match_cache = MatchCache(MATCH_CACHE_SIZE)
@@ -0,0 +1,205 @@
+import bisect
+import logging
+import math
+import threading
+from typing import Callable
+
+from aiohttp import web
+
+# Seconds, from a cache hit on the database up to a Riot request that had to wait for the rate limiter
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry: list["Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Metrics are exposed in the Prometheus text format. Values are updated from the event loop and from the
+# database threads, so every metric guards its values with a lock.
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _sample(self, suffix: str, key: tuple[str, ...], value: float, extra: tuple[tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        labels = "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+        return f"{self.name}{suffix}{labels} {_format_value(value)}"
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}", *self.samples()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            return [self._sample("", key, value) for key, value in sorted(self.values.items())]
+
+
+# Gauges are either set directly or read from a function at scrape time. The function returns a single value,
+# or a value per label tuple for labelled gauges.
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+        self.function: Callable[[], float | dict[tuple, float]] | None = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def set_function(self, function: Callable[[], float | dict[tuple, float]]):
+        self.function = function
+
+    def samples(self) -> list[str]:
+        if self.function is None:
+            with self.lock:
+                values = dict(self.values)
+        else:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        return [self._sample("", tuple(map(str, key)), value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label tuple: the count of observations in each bucket (not cumulative, +Inf last), and their sum
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts = self.counts.get(key)
+            if counts is None:
+                counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+                self.sums[key] = 0.0
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sums[key] += value
+
+    def samples(self) -> list[str]:
+        samples = []
+        with self.lock:
+            for key in sorted(self.counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), self.counts[key]):
+                    cumulative += count
+                    samples.append(self._sample("_bucket", key, cumulative, (("le", _format_value(bound)),)))
+                samples.append(self._sample("_sum", key, self.sums[key]))
+                samples.append(self._sample("_count", key, cumulative))
+        return samples
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in registry:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            logging.error(f"Could not collect metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(body=render_metrics().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+# Serves /metrics for Prometheus. Runs on the bot's event loop, so scrapes see the in-memory state as is.
+class MetricsServer:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.runner: web.AppRunner | None = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logging.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+POLL_DURATION = Histogram(
+    "the_house_poll_duration_seconds", "Time taken to poll one League of Legends account", ("region",)
+)
+POLL_LAG = Histogram(
+    "the_house_poll_lag_seconds", "How late polls start after they were due, grows when workers fall behind",
+    ("region",), buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+RIOT_REQUEST_DURATION = Histogram(
+    "the_house_riot_request_duration_seconds", "Riot API request latency, excluding rate limiter waits", ("method",)
+)
+RIOT_RATE_LIMIT_WAIT = Histogram(
+    "the_house_riot_rate_limit_wait_seconds", "Time Riot API requests spent waiting for the rate limiter",
+    ("method",),
+)
+RIOT_RESPONSES = Counter(
+    "the_house_riot_responses_total", "Riot API responses by method and HTTP status", ("method", "status")
+)
+RIOT_RATE_LIMIT_REMAINING = Gauge(
+    "the_house_riot_rate_limit_remaining", "Requests left in each Riot rate limit window",
+    ("routing", "method", "window"),
+)
+TRACKED_ACCOUNTS = Gauge("the_house_tracked_accounts", "League of Legends PUUIDs being polled")
+ACTIVE_BET_GAMES = Gauge("the_house_active_bet_games", "Announced games whose bets are open or awaiting a result")
+ACTIVE_BETS = Gauge("the_house_active_bets", "Bets placed on games that have not been settled yet")
+LIVE_GAMES = Gauge("the_house_live_games", "Live games shared between tracked players")
+DB_CALL_DURATION = Histogram(
+    "the_house_db_call_duration_seconds", "Time spent running each db_utils function on a database thread",
+    ("function",),
+)
+DB_EXECUTOR_WAIT = Histogram(
+    "the_house_db_executor_wait_seconds", "Time db_utils calls waited for a free database thread", ("function",)
+)
+COMMAND_DURATION = Histogram(
+    "the_house_command_duration_seconds", "Slash command latency by command name and outcome",
+    ("command", "status"),
+)
@@ -0,0 +1,56 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('discord_account_id', sa.BigInteger(), nullable=False, unique=True),
+    )
+    op.create_table(
+        'guilds',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('guild_id', sa.BigInteger(), nullable=False, unique=True),
+        sa.Column('channel_id', sa.BigInteger(), nullable=True),
+        sa.Column('currency', sa.String(), nullable=True),
+    )
+    op.create_table(
+        'banks',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('coins', sa.Float(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('guild_id', sa.Integer(), sa.ForeignKey('guilds.id'), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=True),
+        sa.Column('max_streak', sa.Integer(), nullable=True),
+        sa.Column('last_daily', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('user_id', 'guild_id', name='_user_guild_bank_uc'),
+    )
+    op.create_table(
+        'league_of_legends_accounts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.BigInteger(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('guild_id', sa.BigInteger(), sa.ForeignKey('guilds.id'), nullable=False),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('puuid', sa.String(), nullable=False),
+        sa.UniqueConstraint('user_id', 'guild_id', name='_user_guild_lol_uc'),
+    )
+
+
+def downgrade():
+    op.drop_table('league_of_legends_accounts')
+    op.drop_table('banks')
+    op.drop_table('guilds')
+    op.drop_table('users')
@@ -0,0 +1,54 @@
+"""match store, match results and cached riot ids
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:01
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that ran the bot before migrations existed may already have these from create_all
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('league_of_legends_matches'):
+        op.create_table(
+            'league_of_legends_matches',
+            sa.Column('match_id', sa.String(), primary_key=True),
+            sa.Column('details', sa.JSON(), nullable=False),
+        )
+
+    if not inspector.has_table('league_of_legends_match_results'):
+        op.create_table(
+            'league_of_legends_match_results',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('puuid', sa.String(), nullable=False),
+            sa.Column('match_id', sa.String(), nullable=False),
+            sa.Column('queue_id', sa.Integer(), nullable=True),
+            sa.Column('win', sa.Boolean(), nullable=False),
+            sa.Column('game_end_timestamp', sa.BigInteger(), nullable=False),
+            sa.UniqueConstraint('puuid', 'match_id', name='_puuid_match_result_uc'),
+        )
+
+    account_columns = {column['name'] for column in inspector.get_columns('league_of_legends_accounts')}
+    if 'game_name' not in account_columns:
+        op.add_column('league_of_legends_accounts', sa.Column('game_name', sa.String(), nullable=True))
+    if 'tag_line' not in account_columns:
+        op.add_column('league_of_legends_accounts', sa.Column('tag_line', sa.String(), nullable=True))
+    if 'riot_id_updated_at' not in account_columns:
+        op.add_column('league_of_legends_accounts', sa.Column('riot_id_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('league_of_legends_accounts', 'riot_id_updated_at')
+    op.drop_column('league_of_legends_accounts', 'tag_line')
+    op.drop_column('league_of_legends_accounts', 'game_name')
+    op.drop_table('league_of_legends_match_results')
+    op.drop_table('league_of_legends_matches')
@@ -0,0 +1,32 @@
+"""indexes for the poller, leaderboard and odds lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:02
+
+"""
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # get_lol_accounts_by_puuid
+    op.create_index('ix_lol_accounts_puuid_region', 'league_of_legends_accounts', ['puuid', 'region'])
+    # get_lol_accounts_by_guild_id
+    op.create_index('ix_lol_accounts_guild_id', 'league_of_legends_accounts', ['guild_id'])
+    # get_banks_sorted_by_coins_for_guild, read backwards for ORDER BY coins DESC
+    op.create_index('ix_banks_guild_id_coins', 'banks', ['guild_id', 'coins'])
+    # get_recent_match_results
+    op.create_index('ix_match_results_puuid_queue_end', 'league_of_legends_match_results',
+                    ['puuid', 'queue_id', 'game_end_timestamp'])
+
+
+def downgrade():
+    op.drop_index('ix_match_results_puuid_queue_end', table_name='league_of_legends_match_results')
+    op.drop_index('ix_banks_guild_id_coins', table_name='banks')
+    op.drop_index('ix_lol_accounts_guild_id', table_name='league_of_legends_accounts')
+    op.drop_index('ix_lol_accounts_puuid_region', table_name='league_of_legends_accounts')
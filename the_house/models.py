@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, BigInteger, ForeignKey, String, UniqueConstraint, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, String, UniqueConstraint, Float, DateTime, JSON, \
+    Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -37,10 +38,13 @@ class Bank(Base):
     max_streak = Column(Integer, default=0)
     last_daily = Column(DateTime, default=datetime(1970, 1, 1))
 
-    __table_args__ = (UniqueConstraint('user_id', 'guild_id', name='_user_guild_bank_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'guild_id', name='_user_guild_bank_uc'),
+        Index('ix_banks_guild_id_coins', 'guild_id', 'coins'),
+    )
 
-    user = relationship('User', back_populates='banks')
-    guild = relationship('Guild', back_populates='banks')
+    user = relationship('User', back_populates='banks', lazy='joined')
+    guild = relationship('Guild', back_populates='banks', lazy='joined')
 
 
 class LeagueOfLegendsAccount(Base):
@@ -50,8 +54,36 @@ class LeagueOfLegendsAccount(Base):
     guild_id = Column(BigInteger, ForeignKey('guilds.id'), nullable=False)
     region = Column(String, nullable=False)
     puuid = Column(String, nullable=False)
+    game_name = Column(String, nullable=True)
+    tag_line = Column(String, nullable=True)
+    riot_id_updated_at = Column(DateTime, nullable=True)
 
-    __table_args__ = (UniqueConstraint('user_id', 'guild_id', name='_user_guild_lol_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'guild_id', name='_user_guild_lol_uc'),
+        Index('ix_lol_accounts_puuid_region', 'puuid', 'region'),
+        Index('ix_lol_accounts_guild_id', 'guild_id'),
+    )
 
-    user = relationship('User', back_populates='lol_accounts')
-    guild = relationship('Guild', back_populates='lol_accounts')
+    user = relationship('User', back_populates='lol_accounts', lazy='joined')
+    guild = relationship('Guild', back_populates='lol_accounts', lazy='joined')
+
+
+class LeagueOfLegendsMatch(Base):
+    __tablename__ = 'league_of_legends_matches'
+    match_id = Column(String, primary_key=True)
+    details = Column(JSON, nullable=False)
+
+
+class LeagueOfLegendsMatchResult(Base):
+    __tablename__ = 'league_of_legends_match_results'
+    id = Column(Integer, primary_key=True)
+    puuid = Column(String, nullable=False)
+    match_id = Column(String, nullable=False)
+    queue_id = Column(Integer, nullable=True)
+    win = Column(Boolean, nullable=False)
+    game_end_timestamp = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('puuid', 'match_id', name='_puuid_match_result_uc'),
+        Index('ix_match_results_puuid_queue_end', 'puuid', 'queue_id', 'game_end_timestamp'),
+    )
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from config import ODDS_MATCH_WINDOW
+from db_utils import get_recent_match_results, save_match_results
+from lol_api_utils import get_match_ids_by_puuid, get_match_details
+
+
+def get_match_result(puuid: str, match_id: str, match_details: dict) -> dict | None:
+    info = match_details.get('info', {})
+    for participant in info.get('participants', []):
+        if participant['puuid'] == puuid:
+            return {
+                'puuid': puuid,
+                'match_id': match_id,
+                'queue_id': info.get('queueId'),
+                'win': participant['win'],
+                'game_end_timestamp': info.get('gameEndTimestamp') or 0,
+            }
+    return None
+
+
+async def sync_match_results(puuid: str, region: str, queue_id: int = None):
+    stored_results = await get_recent_match_results(puuid, queue_id, ODDS_MATCH_WINDOW)
+
+    # Until the window is full we backfill from the most recent matches, afterwards only matches that
+    # ended after the newest stored result are listed
+    if len(stored_results) < ODDS_MATCH_WINDOW:
+        start_time = None
+    else:
+        start_time = stored_results[0].game_end_timestamp // 1000 + 1
+
+    match_ids = await get_match_ids_by_puuid(puuid=puuid, region=region, count=ODDS_MATCH_WINDOW,
+                                             queue_id=queue_id, start_time=start_time)
+    known_match_ids = {result.match_id for result in stored_results}
+    new_match_ids = [match_id for match_id in match_ids if match_id not in known_match_ids]
+
+    # Fetched concurrently, the Riot rate limiter in fetch_json paces the requests
+    all_match_details = await asyncio.gather(*(get_match_details(match_id, region) for match_id in new_match_ids))
+    new_results = []
+    for match_id, match_details in zip(new_match_ids, all_match_details):
+        result = get_match_result(puuid, match_id, match_details)
+        if result:
+            new_results.append(result)
+
+    logging.info(f"Stored {len(new_results)} new match results for puuid {puuid}, queue_id={queue_id}")
+    await save_match_results(new_results)
+
+
+async def calculate_odds_from_results(puuid: str, queue_id: int = None) -> tuple:
+    results = await get_recent_match_results(puuid, queue_id, ODDS_MATCH_WINDOW)
+    total_games = len(results)
+    wins = sum(1 for result in results if result.win)
+
+    win_rate = wins / total_games if total_games != 0 else 0.5
+    lose_rate = 1 - win_rate
+    win_odds = 1 / win_rate if win_rate != 0 else float('inf')
+    lose_odds = 1 / lose_rate if lose_rate != 0 else float('inf')
+
+    return round(win_odds, 2), round(lose_odds, 2)
+
+
+async def calculate_odds(puuid: str, region: str, queue_id: int = None) -> tuple:
+    await sync_match_results(puuid, region, queue_id)
+    return await calculate_odds_from_results(puuid, queue_id)
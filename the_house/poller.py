@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable
+
+from config import (
+    POLL_INTERVAL_JUST_STARTED,
+    POLL_INTERVAL_IN_GAME,
+    POLL_INTERVAL_RECENTLY_ACTIVE,
+    POLL_INTERVAL_IDLE,
+    POLL_INTERVAL_LONG_IDLE,
+    POLL_INTERVAL_NEVER_SEEN,
+    POLL_INTERVAL_AWAITING_RESULT,
+    RECENTLY_ACTIVE_SECONDS,
+    LONG_IDLE_SECONDS,
+    BET_WINDOW_MINUTES,
+)
+from metrics import POLL_DURATION, POLL_LAG
+
+# Per-account game states: idle and in-game accounts only poll the spectator endpoint, match-v5 is only
+# queried once a game with open bets has disappeared from it
+IDLE = "idle"
+IN_GAME = "in_game"
+AWAITING_RESULT = "awaiting_result"
+
+
+def choose_poll_interval(state: str, game_start_time: float | None, last_seen_playing: float | None,
+                         now: float) -> float:
+    if state == AWAITING_RESULT:
+        return POLL_INTERVAL_AWAITING_RESULT
+
+    if state == IN_GAME:
+        if game_start_time is not None and now - game_start_time < BET_WINDOW_MINUTES * 60:
+            return POLL_INTERVAL_JUST_STARTED
+        return POLL_INTERVAL_IN_GAME
+
+    if last_seen_playing is None:
+        return POLL_INTERVAL_NEVER_SEEN
+
+    idle_time = now - last_seen_playing
+    if idle_time < RECENTLY_ACTIVE_SECONDS:
+        return POLL_INTERVAL_RECENTLY_ACTIVE
+    if idle_time < LONG_IDLE_SECONDS:
+        return POLL_INTERVAL_IDLE
+    return POLL_INTERVAL_LONG_IDLE
+
+
+# Priority queue of accounts ordered by their next poll time. Entries are removed lazily: an account is only
+# polled if the due time popped from the heap is still the one recorded in self.due. An account is never
+# handed to two workers at once, poll_now on a running account polls it again as soon as it is done.
+class PollScheduler:
+    def __init__(self):
+        self.heap: list[tuple[float, str]] = []
+        self.due: dict[str, float] = {}
+        self.tracked: set[str] = set()
+        self.running: set[str] = set()
+        self.rerun: set[str] = set()
+        self.wakeup = asyncio.Event()
+
+    def schedule(self, puuid: str, delay: float):
+        due_time = time.monotonic() + delay
+        self.due[puuid] = due_time
+        heapq.heappush(self.heap, (due_time, puuid))
+        self.wakeup.set()
+
+    def add(self, puuid: str):
+        if puuid not in self.tracked:
+            self.tracked.add(puuid)
+            self.poll_now(puuid)
+
+    def remove(self, puuid: str):
+        self.tracked.discard(puuid)
+        self.due.pop(puuid, None)
+
+    def poll_now(self, puuid: str):
+        if puuid in self.running:
+            self.rerun.add(puuid)
+        elif puuid in self.tracked:
+            self.schedule(puuid, 0)
+
+    def done(self, puuid: str, delay: float):
+        self.running.discard(puuid)
+        if puuid in self.rerun:
+            self.rerun.discard(puuid)
+            delay = 0
+        if puuid in self.tracked:
+            self.schedule(puuid, delay)
+
+    async def next_due(self) -> tuple[str, float]:
+        # Returns the account to poll and how late its poll is
+        while True:
+            while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+
+            timeout = None
+            if self.heap:
+                due_time, puuid = self.heap[0]
+                timeout = due_time - time.monotonic()
+                if timeout <= 0:
+                    heapq.heappop(self.heap)
+                    del self.due[puuid]
+                    self.running.add(puuid)
+                    return puuid, -timeout
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Polls tracked accounts with a bounded pool of workers per platform region, so slow requests to one
+# region never hold up accounts in another. Each region has its own PollScheduler and every account is
+# rescheduled after its poll using the interval returned by poll_interval. The Riot rate limiter in
+# fetch_json paces the workers.
+class PollingEngine:
+    def __init__(self, process_account: Callable[[str, str], Awaitable[None]],
+                 poll_interval: Callable[[str], float], workers_per_region: int):
+        self.process_account = process_account
+        self.poll_interval = poll_interval
+        self.workers_per_region = workers_per_region
+        self.schedulers: dict[str, PollScheduler] = {}
+        self.workers: dict[str, list[asyncio.Task]] = {}
+
+    def _scheduler(self, region: str) -> PollScheduler:
+        if region not in self.schedulers:
+            scheduler = PollScheduler()
+            self.schedulers[region] = scheduler
+            self.workers[region] = [
+                asyncio.create_task(self._worker(region, scheduler), name=f"poller-{region}-{i}")
+                for i in range(self.workers_per_region)
+            ]
+        return self.schedulers[region]
+
+    async def _worker(self, region: str, scheduler: PollScheduler):
+        while True:
+            puuid, lag = await scheduler.next_due()
+            POLL_LAG.observe(lag, region=region)
+            start = time.perf_counter()
+            try:
+                await self.process_account(puuid, region)
+            except Exception as e:
+                logging.error(f"Error processing League of Legends account {puuid} in {region}: {e}")
+            finally:
+                POLL_DURATION.observe(time.perf_counter() - start, region=region)
+                scheduler.done(puuid, self.poll_interval(puuid))
+
+    def sync_accounts(self, puuids_by_region: dict[str, set[str]]):
+        for region, puuids in puuids_by_region.items():
+            scheduler = self._scheduler(region)
+            for puuid in puuids:
+                scheduler.add(puuid)
+
+        for region, scheduler in self.schedulers.items():
+            for puuid in scheduler.tracked - puuids_by_region.get(region, set()):
+                scheduler.remove(puuid)
+
+    def poll_now(self, puuid: str, region: str):
+        scheduler = self.schedulers.get(region)
+        if scheduler:
+            scheduler.poll_now(puuid)
+
+    def tracked_count(self) -> int:
+        return sum(len(scheduler.tracked) for scheduler in self.schedulers.values())
+
+    async def stop(self):
+        tasks = [task for region_tasks in self.workers.values() for task in region_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.schedulers.clear()
+        self.workers.clear()
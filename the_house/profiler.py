@@ -0,0 +1,52 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+# Samples the stack of one thread at a fixed interval from a separate thread. Pointed at the event loop thread,
+# it shows what the loop is busy with: anything that shows up a lot is holding up every other coroutine.
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def sample(self, seconds: float) -> Counter:
+        # Blocking, run it on an executor thread. Stacks are counted root first, as "frame;frame;frame".
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being recorded.")
+        stacks = Counter()
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(self.thread_id)
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    stacks[";".join(reversed(names))] += 1
+                time.sleep(self.interval)
+        finally:
+            self.lock.release()
+        return stacks
+
+
+def format_collapsed(stacks: Counter) -> str:
+    # The collapsed stack format read by flamegraph.pl and speedscope
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_frames(stacks: Counter, limit: int = 10) -> list[tuple[str, int]]:
+    # Innermost frames ranked by how many samples they were running in
+    frames = Counter()
+    for stack, count in stacks.items():
+        frames[stack.rsplit(";", 1)[-1]] += count
+    return frames.most_common(limit)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+
+def parse_rate_limits(header: str | None) -> list[tuple[int, int]]:
+    # Riot sends limits as "count:seconds" pairs, e.g. "20:1,100:120"
+    if not header:
+        return []
+
+    limits = []
+    for pair in header.split(","):
+        count, _, seconds = pair.strip().partition(":")
+        if count.isdigit() and seconds.isdigit():
+            limits.append((int(count), int(seconds)))
+    return limits
+
+
+# Riot counts requests in fixed windows that start with the first request after the previous window expired
+class FixedWindow:
+    def __init__(self, count: int, period: int):
+        self.count = count
+        self.period = period
+        self.used = 0
+        self.reset_at = 0.0
+
+    def _roll(self, now: float):
+        if self.reset_at and now >= self.reset_at:
+            self.used = 0
+            self.reset_at = 0.0
+
+    def wait_time(self, now: float) -> float:
+        self._roll(now)
+        if self.used < self.count:
+            return 0.0
+        return self.reset_at - now
+
+    def consume(self, now: float):
+        self._roll(now)
+        if not self.reset_at:
+            self.reset_at = now + self.period
+        self.used += 1
+
+    def sync_count(self, count: int, now: float):
+        # The server's count wins when it is ahead of ours. A count of 1 means its window started with this request,
+        # which reached it after we sent it, so move our reset back to make sure it does not come before Riot's.
+        self._roll(now)
+        if count and (count == 1 or not self.reset_at):
+            self.reset_at = max(self.reset_at, now + self.period)
+        self.used = max(self.used, count)
+
+    def remaining(self, now: float) -> int:
+        self._roll(now)
+        return max(0, self.count - self.used)
+
+
+class RateLimitGroup:
+    def __init__(self, limits: list[tuple[int, int]] | None = None):
+        self.windows: dict[tuple[int, int], FixedWindow] = {}
+        self.blocked_until = 0.0
+        self.set_limits(limits or [])
+
+    def set_limits(self, limits: list[tuple[int, int]]):
+        if not limits or set(limits) == set(self.windows):
+            return
+        self.windows = {limit: self.windows.get(limit) or FixedWindow(*limit) for limit in limits}
+
+    def sync_counts(self, counts: list[tuple[int, int]], now: float):
+        for count, period in counts:
+            for (_, window_period), window in self.windows.items():
+                if window_period == period:
+                    window.sync_count(count, now)
+
+    def wait_time(self, now: float) -> float:
+        wait = max(0.0, self.blocked_until - now)
+        for window in self.windows.values():
+            wait = max(wait, window.wait_time(now))
+        return wait
+
+    def consume(self, now: float):
+        for window in self.windows.values():
+            window.consume(now)
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+# Keeps one application-level group per routing host (na1, euw1, americas, europe, ...) and one method-level group
+# per (routing host, method). Limits start from RIOT_APP_RATE_LIMIT and are replaced by whatever the
+# X-App-Rate-Limit / X-Method-Rate-Limit headers report.
+class RiotRateLimiter:
+    def __init__(self, default_app_limits: list[tuple[int, int]]):
+        self.default_app_limits = default_app_limits
+        self.app_groups: dict[str, RateLimitGroup] = {}
+        self.method_groups: dict[tuple[str, str], RateLimitGroup] = {}
+        self.locks: dict[tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def _app_group(self, routing: str) -> RateLimitGroup:
+        if routing not in self.app_groups:
+            self.app_groups[routing] = RateLimitGroup(self.default_app_limits)
+        return self.app_groups[routing]
+
+    def _method_group(self, routing: str, method: str) -> RateLimitGroup:
+        if (routing, method) not in self.method_groups:
+            self.method_groups[(routing, method)] = RateLimitGroup()
+        return self.method_groups[(routing, method)]
+
+    async def acquire(self, routing: str, method: str):
+        app_group = self._app_group(routing)
+        method_group = self._method_group(routing, method)
+
+        async with self.locks[(routing, method)]:
+            while True:
+                now = time.monotonic()
+                wait = max(app_group.wait_time(now), method_group.wait_time(now))
+                if wait <= 0:
+                    app_group.consume(now)
+                    method_group.consume(now)
+                    return
+                await asyncio.sleep(wait)
+
+    def update_from_headers(self, routing: str, method: str, headers):
+        app_group = self._app_group(routing)
+        method_group = self._method_group(routing, method)
+        now = time.monotonic()
+
+        app_group.set_limits(parse_rate_limits(headers.get("X-App-Rate-Limit")))
+        app_group.sync_counts(parse_rate_limits(headers.get("X-App-Rate-Limit-Count")), now)
+        method_group.set_limits(parse_rate_limits(headers.get("X-Method-Rate-Limit")))
+        method_group.sync_counts(parse_rate_limits(headers.get("X-Method-Rate-Limit-Count")), now)
+
+    def remaining_budget(self) -> dict[tuple[str, str, str], int]:
+        # Requests left per (routing, method, window), application limits are reported as method "application"
+        now = time.monotonic()
+        groups = [((routing, "application"), group) for routing, group in self.app_groups.items()]
+        groups += list(self.method_groups.items())
+        return {
+            (routing, method, f"{count}:{period}"): window.remaining(now)
+            for (routing, method), group in groups
+            for (count, period), window in group.windows.items()
+        }
+
+    def handle_rate_limited(self, routing: str, method: str, headers) -> float:
+        retry_after = headers.get("Retry-After")
+        seconds = float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else 1.0
+        limit_type = headers.get("X-Rate-Limit-Type", "service")
+
+        logging.warning(f"Rate limited on {routing} {method} ({limit_type}), retrying after {seconds}s")
+
+        if limit_type == "application":
+            self._app_group(routing).block_for(seconds)
+        else:
+            self._method_group(routing, method).block_for(seconds)
+        return seconds
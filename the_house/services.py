@@ -1,18 +1,45 @@
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 
 import discord
+from alembic import command
+from alembic.config import Config
+from discord import app_commands
 from discord.ext import commands
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, Session, scoped_session
 
-from config import DATABASE_URL
-from models import Base
+from config import (
+    DATABASE_URL,
+    DATABASE_ECHO,
+    DATABASE_POOL_SIZE,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_SLOW_QUERY_MS,
+    RIOT_APP_RATE_LIMIT,
+    METRICS_HOST,
+    METRICS_PORT,
+)
+from http_client import HttpClient
+from metrics import MetricsServer, COMMAND_DURATION, RIOT_RATE_LIMIT_REMAINING
+from rate_limiter import RiotRateLimiter, parse_rate_limits
+from tracing import current_span, start_span, finish_span, exporter
 
-engine = create_engine(DATABASE_URL, echo=True)
-Base.metadata.create_all(engine)
+engine = create_engine(
+    DATABASE_URL,
+    echo=DATABASE_ECHO,
+    pool_size=DATABASE_POOL_SIZE,
+    max_overflow=DATABASE_MAX_OVERFLOW,
+    pool_pre_ping=DATABASE_POOL_PRE_PING,
+    pool_recycle=DATABASE_POOL_RECYCLE,
+)
+# One session per database thread, removed again at the end of every db_utils call
 SessionLocal = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 )
 
 logging.basicConfig(
@@ -21,16 +48,110 @@ logging.basicConfig(
 )
 
 
+def run_migrations():
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", os.path.join(os.path.dirname(__file__), "migrations"))
+
+    with engine.begin() as connection:
+        alembic_config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+            # Schema created by Base.metadata.create_all before migrations existed
+            logging.info("Stamping existing database with the initial schema revision")
+            command.stamp(alembic_config, "0001")
+        command.upgrade(alembic_config, "head")
+
+
+run_migrations()
+
+
+if DATABASE_SLOW_QUERY_MS > 0:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_times"].pop()) * 1000
+        if elapsed_ms >= DATABASE_SLOW_QUERY_MS:
+            logging.warning(f"Slow query ({elapsed_ms:.1f}ms): {statement}")
+
+
+def finish_command(interaction: discord.Interaction, status: str, error: Exception | None = None):
+    started_at = interaction.extras.get('started_at')
+    if started_at is not None and interaction.command is not None:
+        COMMAND_DURATION.observe(time.perf_counter() - started_at, command=interaction.command.qualified_name,
+                                 status=status)
+    if 'span' in interaction.extras:
+        finish_span(interaction.extras['span'], error)
+
+
+# Times every slash command from the moment it is dispatched until its callback returns or raises. The command
+# runs in the span started here, so its database, Riot and Discord calls show up as children.
+class TheHouseCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras['started_at'] = time.perf_counter()
+        if interaction.command is not None:
+            command_span = start_span(f"command.{interaction.command.qualified_name}", guild_id=interaction.guild_id,
+                                      user_id=interaction.user.id)
+            interaction.extras['span'] = command_span
+            current_span.set(command_span)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        finish_command(interaction, "error", error)
+        await super().on_error(interaction, error)
+
+
+class TheHouseBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, tree_cls=TheHouseCommandTree, **kwargs)
+        self.metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+
+    async def setup_hook(self):
+        await services.http.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        finish_command(interaction, "ok")
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            await services.http.close()
+            if self.metrics_server:
+                await self.metrics_server.stop()
+            if exporter:
+                exporter.flush_now()
+
+
 class _Services:
-    @cached_property
+    @property
     def db(self) -> Session:
         return SessionLocal()
 
+    @cached_property
+    def db_executor(self) -> ThreadPoolExecutor:
+        # One thread per pooled connection, so queued database work never waits on the pool itself
+        return ThreadPoolExecutor(max_workers=DATABASE_POOL_SIZE, thread_name_prefix="db")
+
+    @cached_property
+    def http(self) -> HttpClient:
+        return HttpClient()
+
+    @cached_property
+    def rate_limiter(self) -> RiotRateLimiter:
+        rate_limiter = RiotRateLimiter(parse_rate_limits(RIOT_APP_RATE_LIMIT))
+        RIOT_RATE_LIMIT_REMAINING.set_function(rate_limiter.remaining_budget)
+        return rate_limiter
+
     @cached_property
     def bot(self) -> discord.Client:
         intents = discord.Intents.default()
         intents.message_content = True
-        bot = commands.Bot(command_prefix="!", intents=intents)
+        bot = TheHouseBot(command_prefix="!", intents=intents)
 
         return bot
 
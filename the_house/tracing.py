@@ -0,0 +1,123 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from config import TRACE_FILE, TRACE_MIN_MS, TRACE_FLUSH_INTERVAL
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    started_at: float
+    start: float
+    attributes: dict = field(default_factory=dict)
+    duration_ms: float | None = None
+    error: str | None = None
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }, default=str)
+
+
+# The span the running task is in, new spans become its children. Tasks copy the context they were created in,
+# so background work started inside a span (e.g. odds calculation) stays part of the same trace.
+current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def start_span(name: str, **attributes) -> Span:
+    parent = current_span.get()
+    return Span(name, parent.trace_id if parent else _new_id(), _new_id(), parent.span_id if parent else None,
+                time.time(), time.perf_counter(), attributes)
+
+
+def finish_span(span: Span, error: BaseException | None = None):
+    if span.duration_ms is not None:
+        return
+    span.duration_ms = (time.perf_counter() - span.start) * 1000
+    if error is not None:
+        span.error = repr(error)
+    if exporter is not None and span.duration_ms >= TRACE_MIN_MS:
+        exporter.add(span)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    new_span = start_span(name, **attributes)
+    token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        finish_span(new_span, e)
+        raise
+    finally:
+        current_span.reset(token)
+        finish_span(new_span)
+
+
+def traced(name: str):
+    # Runs every call of the decorated coroutine function in its own span
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Collects finished spans and appends them to TRACE_FILE as JSON lines. Writes happen on the default executor
+# every TRACE_FLUSH_INTERVAL seconds, so exporting never blocks the event loop.
+class SpanExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self.pending: list[str] = []
+
+    def add(self, finished: Span):
+        self.pending.append(finished.to_json())
+
+    def _write(self, lines: list[str]):
+        with open(self.path, "a") as file:
+            file.write("\n".join(lines) + "\n")
+
+    def flush_now(self):
+        lines, self.pending = self.pending, []
+        if lines:
+            self._write(lines)
+
+    async def run(self):
+        logging.info(f"Exporting spans to {self.path}")
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(TRACE_FLUSH_INTERVAL)
+            lines, self.pending = self.pending, []
+            if lines:
+                try:
+                    await loop.run_in_executor(None, self._write, lines)
+                except OSError as e:
+                    logging.error(f"Could not export {len(lines)} spans: {e}")
+
+
+exporter = SpanExporter(TRACE_FILE) if TRACE_FILE else None
@@ -1,5 +1,8 @@
 import asyncio
+import functools
 import logging
+import os
+import threading
 import time
 from datetime import datetime, timedelta
 
@@ -7,77 +10,85 @@ import discord
 from discord import app_commands
 from discord.ui import View, Button
 
+from config import (
+    POLL_WORKERS_PER_REGION,
+    ACCOUNT_REFRESH_INTERVAL,
+    BET_WINDOW_MINUTES,
+    MATCH_RESULT_TIMEOUT,
+    ODDS_CONCURRENCY,
+    ODDS_TIMEOUT,
+    LIVE_GAME_MAX_AGE,
+    CHAMPION_INDEX_REFRESH_INTERVAL,
+    RIOT_ID_TTL,
+    IDENTITY_CACHE_TTL,
+    IDENTITY_CACHE_SIZE,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+)
 from db_utils import (
-    create_user,
-    get_user_by_user_table_id,
-    get_user_by_discord_account_id,
-    create_guild,
-    create_bank,
-    get_bank_by_user_and_guild,
-    get_guild_by_guild_id,
+    resolve_member,
+    resolve_guild,
+    get_users_by_user_table_ids,
+    set_guild_channel,
+    set_guild_currency,
     set_lol_account,
-    get_lol_account,
-    set_bank_coins,
+    set_riot_id_by_puuid,
+    get_lol_account_by_discord_account_id,
+    debit_bank_coins,
+    claim_daily_reward,
     get_banks_sorted_by_coins_for_guild,
-    get_all_banks,
-    increment_multiple_bank_coins,
-    get_all_unique_puuids, get_region_by_puuid, get_lol_accounts_by_puuid
+    apply_bank_coin_deltas,
+    get_lol_account,
+    get_lol_accounts_by_puuid,
+    get_lol_accounts_by_guild_id,
+    get_all_league_of_legends_accounts
 )
+from account_registry import AccountRegistry, AccountChangeListener
+from announcements import fan_out
+from bet_book import BetBook, BetGame, Wager
+from identity import IdentityCache, Identity
+from live_games import LiveGameRegistry
 from lol_api_utils import (
     get_account_by_riot_id,
     get_account_info_by_puuid,
     get_summoner_by_puuid,
-    get_match_ids_by_puuid,
     get_match_details,
     get_live_match_details,
-    get_champion_icon
+    get_match_id,
+    get_champion_icon,
+    refresh_champion_index,
+    champion_index,
+    RiotApiError
 )
+from match_cache import match_cache
+from metrics import TRACKED_ACCOUNTS, ACTIVE_BET_GAMES, ACTIVE_BETS, LIVE_GAMES
 from models import LeagueOfLegendsAccount
-from services import services
+from odds_utils import calculate_odds, calculate_odds_from_results
+from poller import PollingEngine, choose_poll_interval, IDLE, IN_GAME, AWAITING_RESULT
+from profiler import SamplingProfiler, format_collapsed, top_frames
+from services import services, engine
+from tracing import traced, exporter as span_exporter
 
 bot = services.bot
+identity_cache = IdentityCache(bot, IDENTITY_CACHE_TTL, IDENTITY_CACHE_SIZE)
+account_registry = AccountRegistry()
+live_games = LiveGameRegistry()
+
+ODDS_PENDING = "Calculating..."
+# Even odds, used when neither the Riot API nor stored match results are available
+DEFAULT_ODDS = (2.0, 2.0)
 
 cached_league_of_legends_games = {}
-active_bets = {}
+bet_book = BetBook()
+last_seen_playing = {}
 last_execution_date = datetime.utcnow().date()
-
-
-def calculate_sleep_times(num_accounts: int, requests_per_account: int = 3, max_requests_per_second: int = 20,
-                          max_requests_per_2_minutes: int = 100):
-    short_term_sleep = max(0.2, requests_per_account / max_requests_per_second)
-
-    total_requests = num_accounts * requests_per_account
-
-    total_processing_time = num_accounts * short_term_sleep
-
-    if total_requests > max_requests_per_2_minutes:
-        raise ValueError(f"Number of accounts exceeds the maximum requests allowed in 2 minutes")
-
-    additional_time_needed = (120 * total_requests / max_requests_per_2_minutes) - total_processing_time
-
-    long_term_sleep = max(0.0, additional_time_needed)
-
-    return short_term_sleep, long_term_sleep
-
-
-async def calculate_odds(puuid: str, region: str, queue_id=int) -> tuple:
-    wins = 0
-    match_ids = await get_match_ids_by_puuid(puuid=puuid, region=region, count=20, queue_id=queue_id)
-    total_games = len(match_ids)
-    for match_id in match_ids:
-        match_details = await get_match_details(match_id, region)
-        for participant in match_details['info']['participants']:
-            if participant['puuid'] == puuid:
-                if participant['win']:
-                    wins += 1
-                break
-
-    win_rate = wins / total_games if total_games != 0 else 0.5
-    lose_rate = 1 - win_rate
-    win_odds = 1 / win_rate if win_rate != 0 else float('inf')
-    lose_odds = 1 / lose_rate if lose_rate != 0 else float('inf')
-
-    return round(win_odds, 2), round(lose_odds, 2)
+background_tasks = {}
+odds_tasks = set()
+odds_semaphore = asyncio.Semaphore(ODDS_CONCURRENCY)
+# Samples the event loop thread, which bot.run() runs on
+profiler = SamplingProfiler(threading.main_thread().ident, PROFILE_INTERVAL_MS / 1000)
+riot_id_refreshes = {}
 
 
 async def did_player_win(puuid: str, completed_match_details: dict) -> bool:
@@ -102,162 +113,223 @@ async def did_player_win(puuid: str, completed_match_details: dict) -> bool:
     return False
 
 
-async def payout_winners(player_bets: dict, result_win: bool):
+async def payout_winners(player_bets: BetGame, result_win: bool):
     logging.info(f"player_bets={player_bets}, result_win={result_win}")
-    win_odds = player_bets['win_odds']
-    lose_odds = player_bets['lose_odds']
+    win_odds = player_bets.win_odds
+    lose_odds = player_bets.lose_odds
 
     logging.info("Starting payout process")
     logging.info(f"Win odds: {win_odds}, Lose odds: {lose_odds}, Result win: {result_win}")
 
-    for individual_bet in player_bets['bets']:
+    payouts = {}
+    for wager in player_bets.wagers:
         payout = 0
-        discord_id = individual_bet['discord_id']
-        server_id = individual_bet['server_id']
-        wagered_amount = individual_bet['wagered_amount']
-        wagered_win = individual_bet['wagered_win']
+        wagered_amount = wager.amount
+        wagered_win = wager.wagered_win
 
-        logging.info(f"Processing bet for Discord ID: {discord_id}")
+        logging.info(f"Processing bet for user ID: {wager.user_id}")
         logging.info(f"Wagered amount: {wagered_amount}, Wagered win: {wagered_win}")
 
-        user = get_user_by_user_table_id(discord_id)
-        bank = get_bank_by_user_and_guild(discord_id, server_id)
-
-        logging.info(f"Retrieved user with ID: {user.id}")
-        logging.info(f"Current bank coins: {bank.coins}")
-
         if wagered_win == result_win:
             payout = round(wagered_amount * (win_odds if wagered_win else lose_odds), 2)
             logging.info(f"Bet result matches the game result. Calculated payout: {payout}")
         else:
             logging.info("Bet result does not match the game result. No payout.")
 
-        logging.info(f"Paying out {payout} coins to user ID: {user.id}")
-
-        set_bank_coins(user.id, server_id, bank.coins + payout)
-        logging.info(f"Updated bank coins for user ID: {user.id} to {bank.coins + payout}")
+        if payout:
+            key = (wager.user_id, wager.guild_id)
+            payouts[key] = payouts.get(key, 0) + payout
 
-    logging.info("Payout process completed")
+    balances = await apply_bank_coin_deltas(payouts)
+    logging.info(f"Payout process completed, updated balances: {balances}")
 
 
-async def refund_bets(player_bets: dict):
+async def refund_bets(player_bets: BetGame):
     logging.info("Starting refund process")
-    for individual_bet in player_bets['bets']:
-        discord_id = individual_bet['discord_id']
-        server_id = individual_bet['server_id']
-        wagered_amount = individual_bet['wagered_amount']
+    refunds = {}
+    for wager in player_bets.wagers:
+        key = (wager.user_id, wager.guild_id)
+        refunds[key] = refunds.get(key, 0) + wager.amount
 
-        user = get_user_by_user_table_id(discord_id)
-        bank = get_bank_by_user_and_guild(discord_id, server_id)
+    balances = await apply_bank_coin_deltas(refunds)
+    logging.info(f"Refund process completed, updated balances: {balances}")
 
-        logging.info(f"Refunding {wagered_amount} coins to user ID: {user.id}")
-        set_bank_coins(user.id, server_id, bank.coins + wagered_amount)
-        logging.info(f"Updated bank coins for user ID: {user.id} to {bank.coins + wagered_amount}")
 
-    logging.info("Refund process completed")
+async def process_league_of_legends_account(puuid: str, region: str):
+    game = cached_league_of_legends_games.get(puuid)
+    if game and game['state'] == AWAITING_RESULT:
+        await settle_league_of_legends_game(puuid, region, game)
+        return
 
+    live_match_details = await get_live_game(puuid, region)
+    live_match_game_id = live_match_details.get('gameId')
+    if live_match_game_id:
+        last_seen_playing[puuid] = time.time()
 
-async def update_league_of_legends_accounts(short_sleep_time: float, puuids: set[str]):
-    logging.info(f"Current bets = {active_bets}")
+    if game is None:
+        # First poll since startup: a game that is already running was never announced, so it gets no bets
+        if live_match_game_id:
+            cached_league_of_legends_games[puuid] = in_game_state(live_match_details, region)
+        else:
+            set_idle(puuid)
+        return
+
+    if game['state'] == IN_GAME:
+        if game['game_id'] == live_match_game_id:
+            return
+
+        logging.info(f"Match {game['match_id']} ended for puuid {puuid}")
+        player_bets = bet_book.get(puuid)
+        if player_bets and player_bets.wagers:
+            cached_league_of_legends_games[puuid] = {**game, 'state': AWAITING_RESULT, 'ended_at': time.time()}
+            return
+        bet_book.close(puuid)
+
+    if live_match_game_id:
+        await start_league_of_legends_game(puuid, region, live_match_details)
+    else:
+        set_idle(puuid)
 
-    for puuid in puuids:
-        try:
-            await asyncio.sleep(short_sleep_time)
-            await process_league_of_legends_account(puuid)
-        except Exception as e:
-            logging.error(f"Error processing League of Legends account: {e}")
 
+async def get_live_game(puuid: str, region: str) -> dict:
+    # Tracked players in the same game share one LiveGame: a recent spectator response from any of them is
+    # reused, concurrent polls of the game send a single request and its end is seen by all of them at once
+    game = live_games.game_for(puuid)
+    if game and game.ended:
+        return {}
+    if game and time.monotonic() - game.checked_at < LIVE_GAME_MAX_AGE:
+        return game.details
 
-async def process_league_of_legends_account(puuid: str):
-    # Account properties
-    region = get_region_by_puuid(puuid)
-    accounts = get_lol_accounts_by_puuid(puuid)
+    live_match_details = await live_games.requests.run(
+        ('spectator', game.game_id if game else puuid), lambda: get_live_match_details(puuid, region)
+    )
+    if live_match_details:
+        for linked_puuid in live_games.observe(live_match_details, region, account_registry.tracks):
+            if linked_puuid != puuid:
+                polling_engine.poll_now(linked_puuid, region)
+
+    if game and live_match_details.get('gameId') != game.game_id:
+        live_games.mark_ended(game.game_id)
+        for teammate_puuid in game.puuids - {puuid}:
+            polling_engine.poll_now(teammate_puuid, region)
+
+    if live_match_details and live_games.game_for(puuid) is None:
+        # The shared request was made for a teammate who is already in another game, so this game is over
+        return {}
+    return live_match_details
 
-    # Get Previous Match ID
-    match_ids = await get_match_ids_by_puuid(puuid=puuid, region=region, count=1)
-    last_match_id = match_ids[0]
 
-    # Get Previous Match Details
-    previous_match_details = await get_match_details(last_match_id, region)
+def set_idle(puuid: str):
+    cached_league_of_legends_games[puuid] = {'state': IDLE}
+    live_games.release(puuid)
+
+
+def in_game_state(live_match_details: dict, region: str) -> dict:
+    return {
+        'state': IN_GAME,
+        'game_id': live_match_details['gameId'],
+        'match_id': get_match_id(live_match_details, region),
+        'queue_id': live_match_details.get('gameQueueConfigId'),
+    }
+
+
+@traced("game.start")
+async def start_league_of_legends_game(puuid: str, region: str, live_match_details: dict):
+    # The start is announced right away, odds are calculated in the background and edited into the
+    # announcements once ready. Bets are only accepted after that.
+    game = in_game_state(live_match_details, region)
+    cached_league_of_legends_games[puuid] = game
+    player_bets = bet_book.open(puuid, time.time())
 
-    # Get Live Match Details
     try:
-        live_match_details = await get_live_match_details(puuid, region)
+        player_bets.messages = await send_match_start_discord_messages(puuid, live_match_details)
     except Exception as e:
-        logging.warning(f"Could not get live match details for puuid {puuid}: {e}")
-        live_match_details = {}
-
-    # get ids of previous and live match
-    live_match_game_id = live_match_details.get('gameId', None)
-    previous_match_info = previous_match_details.get('info', None)
-    if not previous_match_info:
-        logging.error(f"Could not get previous match info for puuid {puuid}")
-        raise Exception(f"Could not get previous match info for puuid {puuid}")
-    previous_match_game_id = previous_match_info.get('gameId', None)
-
-    if await league_of_legends_account_just_start_game(live_match_details, puuid):
-        queue_id = previous_match_info.get('queueId', None)
-        game_start_time = time.time()
-        win_odds, lose_odds = await calculate_odds(puuid, region, queue_id=queue_id)
-        logging.info(f"queue_id={queue_id}, win_odds={win_odds}, lose_odds={lose_odds}")
-        active_bets[puuid] = {
-            'win_odds': win_odds,
-            'lose_odds': lose_odds,
-            'start_time': game_start_time,
-            'bets': []
-        }
-        for account in accounts:
-            await send_match_start_discord_message(account, live_match_details)
-            logging.info(f"Sent match start message for puuid {puuid}")
-
-    elif await league_of_legends_account_just_end_game(live_match_details, previous_match_details,
-                                                       puuid) and puuid in active_bets:
-        logging.info(f"Match ended for puuid {puuid}")
-        if len(active_bets[puuid]['bets']) > 0:
-            did_remake_happen = previous_match_info['participants'][0]['gameEndedInEarlySurrender']
-            if did_remake_happen:
-                await refund_bets(active_bets[puuid])
-                logging.info(f"Remake happened for puuid {puuid}")
-            else:
-                result_win = await did_player_win(puuid, previous_match_details)
-                await payout_winners(active_bets[puuid], result_win)
-                for account in accounts:
-                    await send_match_end_discord_message(account, result_win, active_bets[puuid])
-        active_bets.pop(puuid)
-
-    cached_league_of_legends_games[puuid] = {
-        'previous_match_game_id': previous_match_game_id,
-        'live_match_game_id': live_match_game_id
-    }
+        logging.error(f"Could not announce game start for puuid {puuid}: {e!r}")
 
+    task = asyncio.create_task(fill_in_odds(puuid, region, game['queue_id'], player_bets))
+    odds_tasks.add(task)
+    task.add_done_callback(odds_tasks.discard)
 
-async def league_of_legends_account_just_start_game(live_match_details: dict, puuid: str) -> bool:
-    if not live_match_details:
-        return False
 
-    cached_player_matches = cached_league_of_legends_games.get(puuid, None)
+async def calculate_odds_limited(puuid: str, region: str, queue_id: int | None) -> tuple:
+    async with odds_semaphore:
+        return await calculate_odds(puuid, region, queue_id=queue_id)
 
-    if not cached_player_matches or cached_player_matches.get('live_match_game_id', None) == live_match_details.get(
-            'gameId', None):
-        return False
 
-    logging.info(f"cached_player_matches={cached_player_matches}")
-    return True
+@traced("game.odds")
+async def fill_in_odds(puuid: str, region: str, queue_id: int | None, player_bets: BetGame):
+    try:
+        win_odds, lose_odds = await asyncio.wait_for(calculate_odds_limited(puuid, region, queue_id), ODDS_TIMEOUT)
+    except Exception as e:
+        # Fall back to whatever match results are already stored for the player
+        logging.error(f"Could not calculate odds for puuid {puuid}, using stored results: {e!r}")
+        try:
+            win_odds, lose_odds = await calculate_odds_from_results(puuid, queue_id)
+        except Exception as e:
+            logging.error(f"Could not read stored results for puuid {puuid}: {e}")
+            win_odds, lose_odds = DEFAULT_ODDS
 
+    logging.info(f"puuid={puuid}, queue_id={queue_id}, win_odds={win_odds}, lose_odds={lose_odds}")
+    player_bets.win_odds = win_odds
+    player_bets.lose_odds = lose_odds
+    await update_match_start_odds(player_bets)
 
-async def league_of_legends_account_just_end_game(live_match_details: dict, previous_match_details: dict,
-                                                  puuid: str) -> bool:
-    if live_match_details:
-        return False
 
-    cached_player_matches = cached_league_of_legends_games.get(puuid, None)
+@traced("game.settle")
+async def settle_league_of_legends_game(puuid: str, region: str, game: dict):
+    # match-v5 only lists a match some time after it disappears from spectator-v5, so this is retried on
+    # every poll until the result shows up or MATCH_RESULT_TIMEOUT runs out
+    player_bets = bet_book.games[puuid]
+    match_id = game['match_id']
+    try:
+        match_details = await live_games.requests.run(
+            ('match', match_id), lambda: get_match_details(match_id, region)
+        )
+    except Exception as e:
+        # 404s are expected until match-v5 lists the match, other failures get the same deadline
+        if not (isinstance(e, RiotApiError) and e.status == 404):
+            logging.warning(f"Could not fetch result of match {match_id} for puuid {puuid}: {e!r}")
+        if time.time() - game['ended_at'] < MATCH_RESULT_TIMEOUT:
+            return
+        logging.warning(f"No result for match {match_id} after {MATCH_RESULT_TIMEOUT} seconds, "
+                        f"refunding bets for puuid {puuid}")
+        await refund_bets(player_bets)
+        result_win = None
+    else:
+        did_remake_happen = match_details['info']['participants'][0]['gameEndedInEarlySurrender']
+        if did_remake_happen:
+            await refund_bets(player_bets)
+            logging.info(f"Remake happened for puuid {puuid}")
+            result_win = None
+        else:
+            result_win = await did_player_win(puuid, match_details)
+            await payout_winners(player_bets, result_win)
+
+    # The game is settled as soon as the payout or refund is committed, so a failed announcement can't pay it twice
+    bet_book.close(puuid)
+    # Teammates waiting on the same match can settle right away from the match cache
+    live_game = live_games.game_for(puuid)
+    set_idle(puuid)
+    if live_game:
+        for teammate_puuid in live_game.puuids:
+            polling_engine.poll_now(teammate_puuid, region)
+
+    if result_win is not None:
+        try:
+            await send_match_end_discord_messages(puuid, result_win, player_bets)
+        except Exception as e:
+            logging.error(f"Could not announce game end for puuid {puuid}: {e!r}")
 
-    if not cached_player_matches or cached_player_matches.get('live_match_game_id', None) == live_match_details.get(
-            'gameId', None):
-        return False
 
-    logging.info(f"cached_player_matches={cached_player_matches}")
-    return True
+def get_poll_interval(puuid: str) -> float:
+    game = cached_league_of_legends_games.get(puuid) or {}
+    player_bets = bet_book.get(puuid)
+    return choose_poll_interval(
+        state=game.get('state', IDLE),
+        game_start_time=player_bets.start_time if player_bets else None,
+        last_seen_playing=last_seen_playing.get(puuid),
+        now=time.time()
+    )
 
 
 def has_elapsed(start_time: int, end_time: int, minutes: int) -> bool:
@@ -277,18 +349,22 @@ async def on_ready():
         logging.error(e)
     logging.info(f'Bot is ready. Logged in as {bot.user}')
 
-    await asyncio.create_task(update_accounts())
+    # on_ready fires again after every reconnect, the background loops must only be started once
+    if not background_tasks:
+        background_tasks['update_accounts'] = asyncio.create_task(update_accounts())
+        background_tasks['champion_index'] = asyncio.create_task(update_champion_index())
+        if span_exporter:
+            background_tasks['span_exporter'] = asyncio.create_task(span_exporter.run())
 
 
 @bot.tree.command(name="set-betting-channel", description="Set the betting channel")
 @app_commands.checks.has_permissions(manage_guild=True)
 async def set_betting_channel(interaction: discord.Interaction):
     await interaction.response.defer()
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    if not guild:
-        guild = create_guild(interaction.guild.id)
+    guild = await resolve_guild(interaction.guild.id)
 
-    guild.channel_id = interaction.channel.id
+    await set_guild_channel(guild.guild_id, interaction.channel.id)
+    await reload_accounts({'guild_id': guild.id})
     await interaction.followup.send(f'Betting channel has been set to {interaction.channel.mention}.')
 
 
@@ -296,11 +372,10 @@ async def set_betting_channel(interaction: discord.Interaction):
 @app_commands.checks.has_permissions(manage_guild=True)
 async def set_currency(interaction: discord.Interaction, currency: str):
     await interaction.response.defer()
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    if not guild:
-        guild = create_guild(interaction.guild.id)
+    guild = await resolve_guild(interaction.guild.id)
 
-    guild.currency = currency
+    await set_guild_currency(guild.guild_id, currency)
+    await reload_accounts({'guild_id': guild.id})
     await interaction.followup.send(f'Currency has been set to {currency}.')
 
 
@@ -355,15 +430,10 @@ async def set_league_of_legends_account(interaction: discord.Interaction, region
 
         # Step 3: Set League of Legends account in the database
 
-        user = get_user_by_discord_account_id(interaction.user.id)
-        if not user:
-            user = create_user(interaction.user.id)
-
-        guild = get_guild_by_guild_id(interaction.guild.id)
-        if not guild:
-            guild = create_guild(interaction.guild.id)
-
-        set_lol_account(user.id, guild.id, region.value, puuid)
+        user, guild, _ = await resolve_member(interaction.user.id, interaction.guild.id, with_bank=False)
+        await set_lol_account(user.id, guild.id, region.value, puuid, account_info.get('gameName'),
+                              account_info.get('tagLine'))
+        await reload_accounts({'user_id': user.id, 'guild_id': guild.id})
 
         # Step 4: Send success message
         await interaction.followup.send(f'Riot ID: "{riot_id}" on {region.name} has been set.')
@@ -378,24 +448,14 @@ async def set_league_of_legends_account(interaction: discord.Interaction, region
 async def daily(interaction: discord.Interaction):
     await interaction.response.defer()
 
-    user = get_user_by_discord_account_id(interaction.user.id)
-    if not user:
-        user = create_user(interaction.user.id)
-
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    if not guild:
-        guild = create_guild(interaction.guild.id)
-
-    bank = get_bank_by_user_and_guild(user.id, guild.id)
-    if not bank:
-        bank = create_bank(user.id, guild.id)
+    user, guild, bank = await resolve_member(interaction.user.id, interaction.guild.id)
 
     current_time = datetime.utcnow()
-    last_daily_date = bank.last_daily.date() if bank.last_daily != datetime(1970, 1, 1) else None
-    current_date = current_time.date()
+    reward = await claim_daily_reward(user.id, guild.id, current_time, 5, timedelta(hours=48))
 
-    if last_daily_date == current_date:
+    if reward is None:
         # User has already claimed today
+        current_date = current_time.date()
         reset_time = datetime.combine(current_date + timedelta(days=1), datetime.min.time())  # Next day's midnight
         remaining_time = (reset_time - current_time).total_seconds()
         hours, remainder = divmod(remaining_time, 3600)
@@ -404,44 +464,27 @@ async def daily(interaction: discord.Interaction):
             f"You've already claimed your daily {guild.currency}! You can claim again in {int(hours)} hours and {int(minutes)} minutes."
         )
         return
-    elif last_daily_date and (current_time - bank.last_daily).total_seconds() > 172800:
+
+    current_streak = reward['current_streak']
+    max_streak = reward['max_streak']
+    if current_streak == 1 and reward['previous_last_daily'] != datetime(1970, 1, 1):
         # Missed daily for more than 48 hours
-        bank.current_streak = 1
         streak_message = "You missed your daily reward for more than 48 hours. Your streak has been reset."
+    elif current_streak > reward['previous_max_streak']:
+        streak_message = f"Congratulations! You're on your max streak of {max_streak} days! Keep it up!"
     else:
-        bank.current_streak += 1
-        if bank.current_streak > bank.max_streak:
-            bank.max_streak = bank.current_streak
-            streak_message = f"Congratulations! You're on your max streak of {bank.max_streak} days! Keep it up!"
-        else:
-            days_away = bank.max_streak - bank.current_streak
-            streak_message = f"Max streak is {bank.max_streak} days. You're {days_away} days away from reaching it again!"
-
-    coins_earned = bank.current_streak * 5
-    bank.coins += coins_earned
-
-    bank.last_daily = current_time
-    set_bank_coins(user.id, guild.id, bank.coins)
+        days_away = max_streak - current_streak
+        streak_message = f"Max streak is {max_streak} days. You're {days_away} days away from reaching it again!"
 
     await interaction.followup.send(
-        f"You've earned {coins_earned} {guild.currency}!\nYour current streak is {bank.current_streak} days.\n{streak_message}"
+        f"You've earned {reward['coins_earned']} {guild.currency}!\nYour current streak is {current_streak} days.\n{streak_message}"
     )
 
 @bot.tree.command(name="wallet", description="Check the amount of currency in your wallet")
 async def wallet(interaction: discord.Interaction):
     await interaction.response.defer()
 
-    user = get_user_by_discord_account_id(interaction.user.id)
-    if not user:
-        user = create_user(interaction.user.id)
-
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    if not guild:
-        guild = create_guild(interaction.guild.id)
-
-    bank = get_bank_by_user_and_guild(user.id, guild.id)
-    if not bank:
-        bank = create_bank(user.id, guild.id)
+    user, guild, bank = await resolve_member(interaction.user.id, interaction.guild.id)
 
     await interaction.followup.send(f'You have {bank.coins:.2f} {guild.currency} in your wallet.')
 
@@ -450,17 +493,15 @@ async def wallet(interaction: discord.Interaction):
 async def leaderboard(interaction: discord.Interaction):
     await interaction.response.defer()
 
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    if not guild:
-        guild = create_guild(interaction.guild.id)
+    guild = await resolve_guild(interaction.guild.id)
 
-    banks = get_banks_sorted_by_coins_for_guild(guild.id)
+    banks = await get_banks_sorted_by_coins_for_guild(guild.id, limit=10)
 
     if not banks:
         await interaction.followup.send("No banks found in this server.")
         return
 
-    server_name = await bot.fetch_guild(guild.guild_id)
+    server_name = interaction.guild.name
 
     embed = discord.Embed(
         title=f"{server_name} Leaderboard",
@@ -468,9 +509,11 @@ async def leaderboard(interaction: discord.Interaction):
         color=discord.Color.gold()
     )
 
-    for i, bank in enumerate(banks[:10]):
-        discord_user = await bot.fetch_user(bank.user.discord_account_id)
-        user_name = discord_user.display_name
+    identities = await identity_cache.resolve_many([bank.user.discord_account_id for bank in banks],
+                                                   interaction.guild.id)
+    for i, bank in enumerate(banks):
+        identity = identities.get(bank.user.discord_account_id)
+        user_name = identity.display_name if identity else str(bank.user.discord_account_id)
         embed.add_field(
             name=f"{i + 1}. {user_name}",
             value=f"{bank.coins:.2f} {guild.currency}",
@@ -514,21 +557,55 @@ async def report_command(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed)
 
 
+async def is_bot_owner(interaction: discord.Interaction) -> bool:
+    return await bot.is_owner(interaction.user)
+
+
+@bot.tree.command(name="profile", description="Profile the bot for a number of seconds (bot owner only)")
+@app_commands.default_permissions(administrator=True)
+@app_commands.check(is_bot_owner)
+async def profile_command(interaction: discord.Interaction,
+                          seconds: app_commands.Range[int, 1, PROFILE_MAX_SECONDS] = 30):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    loop = asyncio.get_running_loop()
+    try:
+        stacks = await loop.run_in_executor(None, profiler.sample, seconds)
+    except RuntimeError as e:
+        await interaction.followup.send(str(e), ephemeral=True)
+        return
+    path = os.path.join(PROFILE_DIR, f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt")
+    await loop.run_in_executor(None, write_profile, path, stacks)
+    logging.info(f"Recorded a {seconds}s profile with {sum(stacks.values())} samples to {path}")
+
+    summary = "\n".join(f"{count:>6} {frame}" for frame, count in top_frames(stacks))
+    await interaction.followup.send(
+        f"{sum(stacks.values())} samples over {seconds}s, busiest frames:\n```{summary}```",
+        file=discord.File(path), ephemeral=True
+    )
+
+
+def write_profile(path: str, stacks):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(format_collapsed(stacks))
+
+
 @bot.tree.command(name="bet", description="Bet on the outcome of the current game")
 async def bet(interaction: discord.Interaction, discord_user: discord.User):
     await interaction.response.defer(ephemeral=True)
 
-    can_create_ui, message = await can_create_bet_view(interaction, discord_user)
+    can_create_ui, message, view = await can_create_bet_view(interaction, discord_user)
 
     if can_create_ui:
-        view = await create_bet_view(interaction, discord_user)
         await interaction.followup.send("Place your bet:", view=view, ephemeral=True)
     else:
         await interaction.followup.send(message, ephemeral=True)
 
 
 class BetView(View):
-    def __init__(self, league_account: LeagueOfLegendsAccount, player_bets, gambler_discord_account, gambler_bank):
+    def __init__(self, league_account: LeagueOfLegendsAccount, player_bets: BetGame, gambler_discord_account,
+                 gambler_bank):
         super().__init__(timeout=None)
         self.account = league_account
         self.player_bets = player_bets
@@ -629,13 +706,14 @@ class BetView(View):
         await self.update_message(interaction)
 
     @discord.ui.button(label='Lock In', style=discord.ButtonStyle.primary, row=3)
+    @traced("view.lock_in")
     async def lock_in(self, interaction: discord.Interaction, button: Button):
         logging.info(f"User {interaction.user.id} attempted to lock in a bet.")
 
-        game_start_time = self.player_bets.get('start_time')
+        game_start_time = self.player_bets.start_time
         current_time = int(time.time())
 
-        if has_elapsed(game_start_time, current_time, 4):
+        if has_elapsed(game_start_time, current_time, BET_WINDOW_MINUTES):
             logging.warning(f"Bet expired for user {interaction.user.id}. Game start time: {game_start_time}, current "
                             f"time: {current_time}.")
             await interaction.response.send_message(
@@ -644,15 +722,21 @@ class BetView(View):
             )
             return
 
-        if 0 < self.amount <= self.bank.coins and self.outcome_win is not None:
-            wager = {
-                'discord_id': self.user.id,
-                'server_id': self.account.guild.id,
-                'wagered_win': self.outcome_win,
-                'wagered_amount': self.amount
-            }
-            self.player_bets['bets'].append(wager)
-            set_bank_coins(self.user.id, self.account.guild.id, self.bank.coins - self.amount)
+        balance = None
+        if self.amount > 0 and self.outcome_win is not None:
+            # The debit only succeeds if the bank still covers the amount at this moment
+            balance = await debit_bank_coins(self.user.id, self.account.guild.id, self.amount)
+
+        if balance is not None:
+            bank_key = (self.user.id, self.account.guild.id)
+            if not bet_book.place(self.player_bets, Wager(*bank_key, self.outcome_win, self.amount)):
+                # The game was settled while the debit was running, give the coins back
+                balances = await apply_bank_coin_deltas({bank_key: self.amount})
+                self.bank.coins = balances.get(bank_key, self.bank.coins)
+                await interaction.response.send_message("Bet has expired.", ephemeral=True)
+                return
+
+            self.bank.coins = balance
             logging.info(
                 f"Bet locked in for user {interaction.user.id}: Amount: {self.amount} {self.account.guild.currency}, "
                 f"Outcome: {'Win' if self.outcome_win else 'Lose'}.")
@@ -670,70 +754,48 @@ class BetView(View):
             )
 
 
-async def can_create_bet_view(interaction: discord.Interaction, discord_user: discord.User) -> tuple[bool, str]:
+async def can_create_bet_view(interaction: discord.Interaction,
+                              discord_user: discord.User) -> tuple[bool, str, BetView | None]:
     logging.info(f"Received bet command from user {interaction.user.id} for target user {discord_user.id}")
 
-    # Fetch or create the user
-    user = get_user_by_discord_account_id(interaction.user.id)
-    if not user:
-        logging.info(f"No user found for {interaction.user.id}. Creating new user.")
-        create_user(interaction.user.id)
-
-    # Fetch or create the target user
-    target_user = get_user_by_discord_account_id(discord_user.id)
-    if not target_user:
-        error_message = (f"No target user found for {discord_user.id}. They do not have a League of Legends account "
-                         f"registered")
-        logging.info(error_message)
-        return False, error_message
-
-        # Fetch the guild information
-    guild = get_guild_by_guild_id(interaction.guild.id)
+    # Fetch or create the gambler together with their guild and bank
+    user, guild, bank = await resolve_member(interaction.user.id, interaction.guild.id)
     logging.debug(f"Retrieved guild information for {interaction.guild.id}: {guild}")
 
     # Get the League of Legends account for the target user
-    target_league_of_legends_account = get_lol_account(target_user.id, guild.id)
+    target_league_of_legends_account = await get_lol_account_by_discord_account_id(discord_user.id, guild.id)
     if not target_league_of_legends_account:
         error_message = f"Target user {discord_user.display_name} does not have a League of Legends account set."
         logging.warning(error_message)
-        return False, error_message
+        return False, error_message, None
 
     # Check for active bets
-    betting_info_for_target_user = active_bets.get(target_league_of_legends_account.puuid, None)
+    betting_info_for_target_user = bet_book.get(target_league_of_legends_account.puuid)
     if not betting_info_for_target_user:
         error_message = f"Target user {discord_user.display_name} does not have an active bet."
         logging.warning(error_message)
-        return False, error_message
+        return False, error_message, None
+
+    if betting_info_for_target_user.win_odds is None:
+        error_message = f"Odds for {discord_user.display_name} are still being calculated, try again in a few seconds."
+        logging.info(error_message)
+        return False, error_message, None
 
     # Check if the bet has expired
-    game_start_time = betting_info_for_target_user.get('start_time')
+    game_start_time = betting_info_for_target_user.start_time
     current_time = int(time.time())
 
     logging.debug(f"Game start time: {game_start_time}, current time: {current_time}")
 
-    if has_elapsed(game_start_time, current_time, 4):
+    if has_elapsed(game_start_time, current_time, BET_WINDOW_MINUTES):
         error_message = f"Bet for {discord_user.display_name} has expired."
         logging.info(error_message)
-        return False, error_message
+        return False, error_message, None
 
     logging.info(f"Sending bet view to user {interaction.user.id}")
-    return True, ""
-
-
-async def create_bet_view(interaction: discord.Interaction, discord_user: discord.User) -> BetView:
-    user = get_user_by_discord_account_id(interaction.user.id)
-    target_user = get_user_by_discord_account_id(discord_user.id)
-    guild = get_guild_by_guild_id(interaction.guild.id)
-    target_league_of_legends_account = get_lol_account(target_user.id, guild.id)
-    betting_info_for_target_user = active_bets.get(target_league_of_legends_account.puuid, None)
-
-    bank = get_bank_by_user_and_guild(user.id, guild.id)
-    if not bank:
-        bank = create_bank(user.id, guild.id)
-
     view = BetView(league_account=target_league_of_legends_account, player_bets=betting_info_for_target_user,
                    gambler_discord_account=user, gambler_bank=bank)
-    return view
+    return True, "", view
 
 
 class BetButtonView(View):
@@ -743,133 +805,204 @@ class BetButtonView(View):
 
     @discord.ui.button(label="Place Bet", style=discord.ButtonStyle.primary)
     async def place_bet_button(self, interaction: discord.Interaction, button: Button):
-        interaction.response.defer()
-        discord_user = await bot.fetch_user(self.account.user.discord_account_id)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        discord_user = await identity_cache.resolve(self.account.user.discord_account_id, interaction.guild.id)
+        if discord_user is None:
+            await interaction.followup.send("Couldn't find that player.", ephemeral=True)
+            return
 
-        can_create_ui, message = await can_create_bet_view(interaction, discord_user)
+        can_create_ui, message, view = await can_create_bet_view(interaction, discord_user)
 
         if can_create_ui:
-            view = await create_bet_view(interaction, discord_user)
-            await interaction.response.send_message("Place your bet:", view=view, ephemeral=True)
+            await interaction.followup.send("Place your bet:", view=view, ephemeral=True)
         else:
-            await interaction.response.send_message(message, ephemeral=True)
-
+            await interaction.followup.send(message, ephemeral=True)
 
-async def send_match_start_discord_message(account: LeagueOfLegendsAccount, match_details, timeout=3):
-    guild_id = account.guild.guild_id
-    channel_id = account.guild.channel_id
-    logging.info("Entering function")
-    logging.info(f"guild_id={guild_id}, channel_id={channel_id}")
 
+async def refresh_riot_id(puuid: str, region: str):
     try:
-        guild = discord.utils.get(bot.guilds, id=guild_id)
-        logging.info(f"guild={guild}")
+        riot_account = await get_account_info_by_puuid(puuid, region)
+        await set_riot_id_by_puuid(puuid, riot_account.get('gameName'), riot_account.get('tagLine'))
+        await reload_accounts({'puuid': puuid})
+        logging.info(f"Refreshed Riot ID for puuid {puuid}: {riot_account.get('gameName')}#{riot_account.get('tagLine')}")
+    except Exception as e:
+        logging.error(f"Could not refresh Riot ID for puuid {puuid}: {e}")
+    finally:
+        riot_id_refreshes.pop(puuid, None)
 
-        if guild:
-            channel = bot.get_channel(channel_id)
-            logging.info(f"channel={channel}")
 
-            if channel:
-                player_active_bets = active_bets.get(account.puuid)
-                logging.info(f"bet={player_active_bets}")
+def get_riot_game_name(account: LeagueOfLegendsAccount) -> str | None:
+    # Never waits on account-v1, a missing or stale name is refreshed in the background for the next announcement
+    is_stale = (account.riot_id_updated_at is None or
+                (datetime.utcnow() - account.riot_id_updated_at).total_seconds() > RIOT_ID_TTL)
+    if is_stale and account.puuid not in riot_id_refreshes:
+        riot_id_refreshes[account.puuid] = asyncio.create_task(refresh_riot_id(account.puuid, account.region))
+    return account.game_name
 
-                discord_user = await bot.fetch_user(account.user.discord_account_id)
-                logging.info(f"discord_user={discord_user}")
 
-                name = discord_user.display_name
-                pfp = discord_user.display_avatar
-                riot_account = await get_account_info_by_puuid(account.puuid, account.region)
-                riot_id = riot_account.get('gameName')
-                logging.info(f"name={name}, pfp={pfp}, riot_id={riot_id}")
+def get_announcement_channel(account: LeagueOfLegendsAccount):
+    if account.guild.channel_id is None or bot.get_guild(account.guild.guild_id) is None:
+        return None
+    return bot.get_channel(account.guild.channel_id)
 
-                for participant in match_details['participants']:
-                    logging.info(f"participant={participant}")
 
-                    if participant['puuid'] == account.puuid:
-                        champion_id = participant['championId']
-                        champion_icon = await get_champion_icon(champion_id)
-                        logging.info(f"champion_id={champion_id}, champion_icon={champion_icon}")
+async def resolve_account_identities(accounts: list[LeagueOfLegendsAccount]) -> list[Identity | None]:
+    return await asyncio.gather(*(
+        identity_cache.resolve(account.user.discord_account_id, account.guild.guild_id) for account in accounts
+    ))
 
-                        message = discord.Embed(title=f"Game started for {riot_id}")
-                        message.set_author(name=name, icon_url=pfp)
-                        message.set_thumbnail(url=champion_icon)
-                        message.add_field(name="Win multiplier", value=player_active_bets['win_odds'])
-                        message.add_field(name="Lose multiplier", value=player_active_bets['lose_odds'])
 
-                        bet_view = BetButtonView(account)
+@traced("discord.match_start")
+async def send_match_start_discord_messages(puuid: str, match_details: dict) -> list[discord.Message]:
+    # Champion, Riot ID and odds are looked up once per game, only the author differs between guilds
+    accounts = [account for account in account_registry.accounts_for(puuid) if get_announcement_channel(account)]
+    if not accounts:
+        return []
 
-                        logging.info("Sending message to channel")
-                        await asyncio.wait_for(channel.send(embed=message, view=bet_view), timeout)
-                        logging.info("Message sent successfully")
+    participant = next((participant for participant in match_details.get('participants', [])
+                        if participant.get('puuid') == puuid), None)
+    if participant is None:
+        logging.error(f"puuid {puuid} is not a participant of game {match_details.get('gameId')}")
+        return []
 
-    except asyncio.TimeoutError:
-        logging.error(f"Sending message timed out after {timeout} seconds")
+    embed = discord.Embed()
+    try:
+        embed.set_thumbnail(url=await get_champion_icon(participant['championId']))
     except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+        logging.error(f"Could not get champion icon for champion {participant['championId']}: {e}")
+    player_bets = bet_book.get(puuid)
+    embed.add_field(name="Win multiplier", value=(player_bets and player_bets.win_odds) or ODDS_PENDING)
+    embed.add_field(name="Lose multiplier", value=(player_bets and player_bets.lose_odds) or ODDS_PENDING)
+    riot_id = get_riot_game_name(accounts[0])
+
+    sends = {}
+    for account, discord_user in zip(accounts, await resolve_account_identities(accounts)):
+        message = embed.copy()
+        message.title = f"Game started for {riot_id or (discord_user and discord_user.display_name)}"
+        if discord_user:
+            message.set_author(name=discord_user.display_name, icon_url=discord_user.display_avatar)
+        channel = get_announcement_channel(account)
+        sends[f"match start for puuid {puuid} to guild {account.guild.guild_id}"] = functools.partial(
+            channel.send, embed=message, view=BetButtonView(account)
+        )
 
+    sent_messages = await fan_out(sends)
+    return [message for message in sent_messages.values() if message is not None]
 
-async def send_match_end_discord_message(account: LeagueOfLegendsAccount, result_win: bool, bet_info: dict,
-                                         timeout=3):
-    guild_id = account.guild.guild_id
-    channel_id = account.guild.channel_id
 
-    try:
-        guild = discord.utils.get(bot.guilds, id=guild_id)
-        if guild:
-            channel = bot.get_channel(channel_id)
-            if channel:
-                target_discord_user = await bot.fetch_user(account.user.discord_account_id)
-                name = target_discord_user.display_name
-                pfp = target_discord_user.display_avatar
-                riot_account = await get_account_info_by_puuid(account.puuid, account.region)
-                riot_id = riot_account.get('gameName')
-
-                message = discord.Embed(title=f"Game ended for {riot_id}")
-                message.set_author(name=name, icon_url=pfp)
-                bets_list = bet_info['bets']
-
-                for individual_bet in bets_list:
-                    if individual_bet['server_id'] == account.guild.id:
-                        user = get_user_by_user_table_id(individual_bet['discord_id'])
-                        discord_user = await bot.fetch_user(user.discord_account_id)
-                        currency = account.guild.currency
-                        name = discord_user.display_name
-                        wagered_amount = individual_bet['wagered_amount']
-                        wagered_win = individual_bet['wagered_win']
-                        win_odds = bet_info['win_odds']
-                        lose_odds = bet_info['lose_odds']
-
-                        logging.debug(f"Processing bet for user {name} (ID: {individual_bet['discord_id']}). "
-                                      f"Wagered {wagered_amount} {currency} on {'Win' if wagered_win else 'Lose'}.")
-
-                        if wagered_win == result_win:
-                            if result_win:
-                                message.add_field(name=f"{name} bet",
-                                                  value=f"{wagered_amount} {currency} on Win: Won **{wagered_amount * win_odds} {currency}**",
-                                                  inline=False)
-                            else:
-                                message.add_field(name=f"{name} bet",
-                                                  value=f"{wagered_amount} {currency} on Lose: Won **{wagered_amount * lose_odds} {currency}**",
-                                                  inline=False)
-                        else:
-                            message.add_field(name=f"{name} bet",
-                                              value=f"{wagered_amount} {currency} on {'Win' if wagered_win else 'Lose'}: "
-                                                    f"Lost **{wagered_amount} {currency}**", inline=False)
-
-                await asyncio.wait_for(channel.send(embed=message), timeout)
-
-    except asyncio.TimeoutError:
-        logging.error(f"Sending message timed out after {timeout} seconds")
-    except Exception as e:
-        logging.error(f"An unexpected error occurred: {e}")
+async def update_match_start_odds(player_bets: BetGame):
+    sends = {}
+    for message in player_bets.messages:
+        embed = message.embeds[0]
+        embed.set_field_at(0, name="Win multiplier", value=player_bets.win_odds)
+        embed.set_field_at(1, name="Lose multiplier", value=player_bets.lose_odds)
+        sends[f"odds update for message {message.id}"] = functools.partial(message.edit, embed=embed)
+    await fan_out(sends, idempotent=True)
+
+
+def format_bet_result(wager: Wager, result_win: bool, bet_info: BetGame, currency: str) -> str:
+    wagered_amount = wager.amount
+    wagered_win = wager.wagered_win
+
+    if wagered_win == result_win:
+        if result_win:
+            return f"{wagered_amount} {currency} on Win: Won **{wagered_amount * bet_info.win_odds} {currency}**"
+        return f"{wagered_amount} {currency} on Lose: Won **{wagered_amount * bet_info.lose_odds} {currency}**"
+    return f"{wagered_amount} {currency} on {'Win' if wagered_win else 'Lose'}: Lost **{wagered_amount} {currency}**"
+
+
+@traced("discord.match_end")
+async def send_match_end_discord_messages(puuid: str, result_win: bool, bet_info: BetGame):
+    # Users and Discord identities for every guild are resolved up front, then all results are sent at once
+    accounts = [account for account in account_registry.accounts_for(puuid) if get_announcement_channel(account)]
+    if not accounts:
+        return
+
+    riot_id = get_riot_game_name(accounts[0])
+    users = await get_users_by_user_table_ids(list(bet_info.wagers_by_user))
+    target_identities, bettor_identities = await asyncio.gather(
+        resolve_account_identities(accounts),
+        asyncio.gather(*(
+            identity_cache.resolve_many(
+                [users[wager.user_id].discord_account_id for wager in bet_info.wagers_for_guild(account.guild.id)],
+                account.guild.guild_id
+            ) for account in accounts
+        ))
+    )
+
+    sends = {}
+    for account, discord_user, identities in zip(accounts, target_identities, bettor_identities):
+        message = discord.Embed(title=f"Game ended for {riot_id or (discord_user and discord_user.display_name)}")
+        if discord_user:
+            message.set_author(name=discord_user.display_name, icon_url=discord_user.display_avatar)
+
+        for wager in bet_info.wagers_for_guild(account.guild.id):
+            user = users[wager.user_id]
+            bettor = identities.get(user.discord_account_id)
+            name = bettor.display_name if bettor else str(user.discord_account_id)
+            message.add_field(name=f"{name} bet",
+                              value=format_bet_result(wager, result_win, bet_info, account.guild.currency),
+                              inline=False)
+
+        channel = get_announcement_channel(account)
+        sends[f"match end for puuid {puuid} to guild {account.guild.guild_id}"] = functools.partial(
+            channel.send, embed=message
+        )
+
+    await fan_out(sends)
+
+
+polling_engine = PollingEngine(process_league_of_legends_account, get_poll_interval, POLL_WORKERS_PER_REGION)
+
+TRACKED_ACCOUNTS.set_function(lambda: polling_engine.tracked_count())
+ACTIVE_BET_GAMES.set_function(lambda: len(bet_book))
+ACTIVE_BETS.set_function(lambda: bet_book.wager_count)
+LIVE_GAMES.set_function(lambda: len(live_games))
+
+
+async def load_accounts():
+    account_registry.replace_all(await get_all_league_of_legends_accounts())
+    polling_engine.sync_accounts(account_registry.puuids_by_region())
+    logging.info(f"Loaded {len(account_registry)} League of Legends accounts")
+
+
+async def reload_accounts(change: dict):
+    # Called after this process changes an account or guild, and for change notifications from other processes
+    if 'puuid' in change:
+        accounts = await get_lol_accounts_by_puuid(change['puuid'])
+    elif 'user_id' in change:
+        account = await get_lol_account(change['user_id'], change['guild_id'])
+        accounts = [account] if account else []
+    else:
+        accounts = await get_lol_accounts_by_guild_id(change['guild_id'])
+
+    account_registry.update(accounts)
+    polling_engine.sync_accounts(account_registry.puuids_by_region())
 
 
 async def update_accounts():
+    # Accounts are read from the database once, after that the registry is only updated on changes: directly
+    # by the commands in this process and through LISTEN/NOTIFY for the ones made by other processes
+    if engine.dialect.name == "postgresql":
+        background_tasks['account_changes'] = asyncio.create_task(
+            AccountChangeListener(engine, reload_accounts, load_accounts).run()
+        )
+    else:
+        await load_accounts()
+
     while True:
-        unique_puuids = get_all_unique_puuids()
-        short_term_sleep, long_term_sleep = calculate_sleep_times(len(unique_puuids))
-        logging.info(
-            f"number of unique league of legends accounts={len(unique_puuids)} short_term_sleep={short_term_sleep}, "
-            f"long_term_sleep={long_term_sleep}")
-        await update_league_of_legends_accounts(short_term_sleep, unique_puuids)
-        await asyncio.sleep(long_term_sleep)
+        live_games.prune(2 * MATCH_RESULT_TIMEOUT)
+        logging.info(f"number of unique league of legends accounts={polling_engine.tracked_count()}, "
+                     f"live games={len(live_games)}, bet games={len(bet_book)}, wagers={bet_book.wager_count}, "
+                     f"match cache={match_cache.stats()}")
+        await asyncio.sleep(ACCOUNT_REFRESH_INTERVAL)
+
+
+async def update_champion_index():
+    champion_index.load()
+    while True:
+        try:
+            await refresh_champion_index()
+        except Exception as e:
+            logging.error(f"Could not refresh champion index: {e}")
+        await asyncio.sleep(CHAMPION_INDEX_REFRESH_INTERVAL)